@@ -1,59 +1,14 @@
+import os
+import sys
 from typing import List
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-def run(code: List[int], inputs: List[int]) -> List[int]:
-    code = code[:]
-    input_iter = iter(inputs)
-    outputs = []
-    pc = 0
-    while True:
-        op = code[pc] % 100
-
-        def invalue(k):
-            arg = code[pc + k]
-            mode = code[pc] // 100 // (10 ** (k - 1)) % 10
-            if mode == 0:
-                return code[arg]
-            if mode == 1:
-                return arg
-            raise Exception('Unknown arg mode %d' % mode)
+from intcode import Machine
 
-        def outaddr(k):
-            return code[pc + k]
 
-        if op == 99:
-            break
-        elif op == 1:
-            code[outaddr(3)] = invalue(1) + invalue(2)
-            pc += 4
-        elif op == 2:
-            code[outaddr(3)] = invalue(1) * invalue(2)
-            pc += 4
-        elif op == 3:
-            code[outaddr(1)] = next(input_iter)
-            pc += 2
-        elif op == 4:
-            outputs.append(invalue(1))
-            pc += 2
-        elif op == 5:
-            if invalue(1) != 0:
-                pc = invalue(2)
-            else:
-                pc += 3
-        elif op == 6:
-            if invalue(1) == 0:
-                pc = invalue(2)
-            else:
-                pc += 3
-        elif op == 7:
-            code[outaddr(3)] = 1 if invalue(1) < invalue(2) else 0
-            pc += 4
-        elif op == 8:
-            code[outaddr(3)] = 1 if invalue(1) == invalue(2) else 0
-            pc += 4
-        else:
-            raise Exception('Unknown op %d' % op)
-    return outputs
+def run(code: List[int], inputs: List[int]) -> List[int]:
+    return list(Machine(code).communicate(inputs))
 
 
 def main():
@@ -0,0 +1,76 @@
+import itertools
+import os
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from intcode import Machine
+from intcode.sweep import sweep
+
+
+class AmplifierChain:
+    """Runs amplifier chains with one booted machine per phase setting.
+
+    Every amplifier starts by reading its phase, so its state when it next
+    asks for a signal is the same in every permutation. That state is
+    computed once per phase and forked for each run.
+    """
+    code: List[int]
+    _boot: Machine
+    _phased: Dict[int, Machine]
+
+    def __init__(self, code: Iterable[int], engine: Callable[[List[int]], Machine] = Machine):
+        self.code = list(code)
+        self._boot = engine(self.code)
+        self._boot.wait_input()
+        self._phased = {}
+
+    def run(self, phases: Sequence[int], signal: int = 0) -> int:
+        """Passes signal through the chain, looping back until an amplifier
+        halts, and returns the last signal."""
+        machines = [self._phase(phase).fork() for phase in phases]
+        while True:
+            for m in machines:
+                if m.wait_interrupt(signal) is None:
+                    return signal
+                signal, = m.receive(1)
+
+    def _phase(self, phase: int) -> Machine:
+        m = self._phased.get(phase)
+        if m is None:
+            m = self._boot.fork()
+            m.send([phase])
+            m.wait_input()
+            self._phased[phase] = m
+        return m
+
+
+def best_signal(code: List[int], phases: Iterable[int], processes: Optional[int] = 1) -> int:
+    """Returns the highest signal over all orderings of phases.
+
+    Runs in this process by default: five phases are 120 runs of a few
+    hundred instructions each, far cheaper than starting a pool. With
+    processes other than 1 (None for one per CPU) permutations are spread
+    over a process pool, each worker booting its own chain.
+    """
+    perms = itertools.permutations(phases)
+    if processes == 1:
+        chain = AmplifierChain(code)
+        return max(chain.run(p) for p in perms)
+    return max(sweep(AmplifierChain.run, code, perms, processes, chunksize=64, setup=AmplifierChain))
+
+
+def test_chain():
+    code = [int(s) for s in '3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5'.split(',')]
+    chain = AmplifierChain(code)
+    assert chain.run([9, 8, 7, 6, 5]) == 139629729
+    assert len(chain._phased) == 5
+    # Forks leave the shared phase machines untouched.
+    assert chain.run([9, 8, 7, 6, 5]) == 139629729
+
+
+def test_best_signal():
+    code = [int(s) for s in '3,15,3,16,1002,16,10,16,1,16,15,15,4,15,99,0,0'.split(',')]
+    assert best_signal(code, range(5), processes=1) == 43210
+    assert best_signal(code, range(5), processes=2) == 43210
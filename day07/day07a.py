@@ -1,71 +1,21 @@
 import itertools
+import os
+import sys
 from typing import List
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-def run(code: List[int], inputs: List[int]) -> List[int]:
-    code = code[:]
-    input_iter = iter(inputs)
-    outputs = []
-    pc = 0
-    while True:
-        op = code[pc] % 100
-
-        def invalue(k):
-            arg = code[pc + k]
-            mode = code[pc] // 100 // (10 ** (k - 1)) % 10
-            if mode == 0:
-                return code[arg]
-            if mode == 1:
-                return arg
-            raise Exception('Unknown arg mode %d' % mode)
-
-        def outaddr(k):
-            return code[pc + k]
-
-        if op == 99:
-            break
-        elif op == 1:
-            code[outaddr(3)] = invalue(1) + invalue(2)
-            pc += 4
-        elif op == 2:
-            code[outaddr(3)] = invalue(1) * invalue(2)
-            pc += 4
-        elif op == 3:
-            code[outaddr(1)] = next(input_iter)
-            pc += 2
-        elif op == 4:
-            outputs.append(invalue(1))
-            pc += 2
-        elif op == 5:
-            if invalue(1) != 0:
-                pc = invalue(2)
-            else:
-                pc += 3
-        elif op == 6:
-            if invalue(1) == 0:
-                pc = invalue(2)
-            else:
-                pc += 3
-        elif op == 7:
-            code[outaddr(3)] = 1 if invalue(1) < invalue(2) else 0
-            pc += 4
-        elif op == 8:
-            code[outaddr(3)] = 1 if invalue(1) == invalue(2) else 0
-            pc += 4
-        else:
-            raise Exception('Unknown op %d' % op)
-    return outputs
+from intcode.batch import run_batch
 
 
 def solve(code: List[int]) -> int:
-    best = 0
-    for phases in itertools.permutations([0, 1, 2, 3, 4]):
-        signal = 0
-        for phase in phases:
-            outputs = run(code, [phase, signal])
-            signal = outputs[0]
-        best = max(best, signal)
-    return best
+    # Runs each amplifier stage for all permutations as one batch.
+    perms = list(itertools.permutations([0, 1, 2, 3, 4]))
+    signals = [0] * len(perms)
+    for stage in range(5):
+        outputs = run_batch(code, [[phases[stage], signal] for phases, signal in zip(perms, signals)])
+        signals = [out[0] for out in outputs]
+    return max(signals)
 
 
 def test_solve():
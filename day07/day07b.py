@@ -1,82 +1,14 @@
-import itertools
-from typing import Generator, List
+import os
+import sys
+from typing import List, Optional
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-def run(code: List[int]) -> Generator[int, int, None]:
-    code = code[:]
-    output = None
-    pc = 0
-    while True:
-        op = code[pc] % 100
+from amplifier import best_signal
 
-        def invalue(k):
-            arg = code[pc + k]
-            mode = code[pc] // 100 // (10 ** (k - 1)) % 10
-            if mode == 0:
-                return code[arg]
-            if mode == 1:
-                return arg
-            raise Exception('Unknown arg mode %d' % mode)
 
-        def outaddr(k):
-            return code[pc + k]
-
-        if op == 99:
-            break
-        elif op == 1:
-            code[outaddr(3)] = invalue(1) + invalue(2)
-            pc += 4
-        elif op == 2:
-            code[outaddr(3)] = invalue(1) * invalue(2)
-            pc += 4
-        elif op == 3:
-            code[outaddr(1)] = yield output
-            output = None
-            pc += 2
-        elif op == 4:
-            assert output is None
-            output = invalue(1)
-            pc += 2
-        elif op == 5:
-            if invalue(1) != 0:
-                pc = invalue(2)
-            else:
-                pc += 3
-        elif op == 6:
-            if invalue(1) == 0:
-                pc = invalue(2)
-            else:
-                pc += 3
-        elif op == 7:
-            code[outaddr(3)] = 1 if invalue(1) < invalue(2) else 0
-            pc += 4
-        elif op == 8:
-            code[outaddr(3)] = 1 if invalue(1) == invalue(2) else 0
-            pc += 4
-        else:
-            raise Exception('Unknown op %d' % op)
-    assert output is not None
-    yield output
-
-
-def solve(code: List[int]) -> int:
-    best = 0
-    for phases in itertools.permutations([5, 6, 7, 8, 9]):
-        signal = 0
-        machines = []
-        for phase in phases:
-            m = run(code)
-            m.send(None)
-            m.send(phase)
-            machines.append(m)
-        try:
-            while True:
-                for m in machines:
-                    signal = m.send(signal)
-        except StopIteration:
-            pass
-        best = max(best, signal)
-    return best
+def solve(code: List[int], processes: Optional[int] = 1) -> int:
+    return best_signal(code, range(5, 10), processes)
 
 
 def test_solve():
@@ -1,130 +1,12 @@
-import abc
+import os
 import sys
 import typing
-from typing import Dict, Iterable, Iterator, List
+from typing import Callable, Dict, Iterator, List, Optional
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-class Memory:
-    _data: List[int]
-
-    def __init__(self, data: Iterable[int]):
-        self._data = list(data)
-
-    def copy(self) -> 'Memory':
-        return Memory(self._data)
-
-    def _ensure(self, i: int) -> None:
-        if i >= len(self._data):
-            self._data.extend(0 for _ in range(i - len(self._data) + 1))
-            assert i == len(self._data) - 1
-
-    def __getitem__(self, i: int) -> int:
-        self._ensure(i)
-        return self._data[i]
-
-    def __setitem__(self, i: int, v: int) -> None:
-        self._ensure(i)
-        self._data[i] = v
-
-
-class IO:
-    @abc.abstractmethod
-    def read_input(self) -> int:
-        ...
-
-    @abc.abstractmethod
-    def write_output(self, value: int) -> None:
-        ...
-
-
-class StaticIO(IO):
-    _input_iter: Iterator[int]
-    outputs: List[int]
-
-    def __init__(self, inputs: Iterable[int]):
-        self._input_iter = iter(inputs)
-        self.outputs = []
-
-    def read_input(self) -> int:
-        return next(self._input_iter)
-
-    def write_output(self, value: int) -> None:
-        self.outputs.append(value)
-
-
-class Machine:
-    _mem: Memory
-    _io: IO
-
-    def __init__(self, mem: Memory, io: IO):
-        self._mem = mem
-        self._io = io
-
-    def run(self) -> None:
-        mem = self._mem
-        io = self._io
-        pc = 0
-        rb = 0
-
-        while True:
-            op = mem[pc] % 100
-
-            def invalue(k):
-                arg = mem[pc + k]
-                mode = mem[pc] // 100 // (10 ** (k - 1)) % 10
-                if mode == 0:
-                    return mem[arg]
-                if mode == 1:
-                    return arg
-                if mode == 2:
-                    return mem[rb + arg]
-                raise Exception('Unknown arg mode %d' % mode)
-
-            def outaddr(k):
-                mode = mem[pc] // 100 // (10 ** (k - 1)) % 10
-                if mode == 0:
-                    return mem[pc + k]
-                if mode == 1:
-                    raise Exception('Immediate outaddr is invalid')
-                if mode == 2:
-                    return mem[pc + k] + rb
-                raise Exception('Unknown arg mode %d' % mode)
-
-            if op == 99:
-                break
-            elif op == 1:
-                mem[outaddr(3)] = invalue(1) + invalue(2)
-                pc += 4
-            elif op == 2:
-                mem[outaddr(3)] = invalue(1) * invalue(2)
-                pc += 4
-            elif op == 3:
-                mem[outaddr(1)] = io.read_input()
-                pc += 2
-            elif op == 4:
-                io.write_output(invalue(1))
-                pc += 2
-            elif op == 5:
-                if invalue(1) != 0:
-                    pc = invalue(2)
-                else:
-                    pc += 3
-            elif op == 6:
-                if invalue(1) == 0:
-                    pc = invalue(2)
-                else:
-                    pc += 3
-            elif op == 7:
-                mem[outaddr(3)] = 1 if invalue(1) < invalue(2) else 0
-                pc += 4
-            elif op == 8:
-                mem[outaddr(3)] = 1 if invalue(1) == invalue(2) else 0
-                pc += 4
-            elif op == 9:
-                rb += invalue(1)
-                pc += 2
-            else:
-                raise Exception('Unknown op %d' % op)
+from intcode import CompiledMachine, InputInterrupt, Machine, RingBuffer, StaticIO
+from screen import Framebuffer
 
 
 class Point(typing.NamedTuple):
@@ -133,10 +15,9 @@ class Point(typing.NamedTuple):
 
 
 def run(code: List[int]) -> Dict[Point, int]:
-    mem = Memory(code)
     io = StaticIO([])
-    mac = Machine(mem, io)
-    mac.run()
+    mac = Machine(code)
+    mac.run(io)
     render = {}
     for i in range(0, len(io.outputs), 3):
         x, y, c = io.outputs[i:i+3]
@@ -144,55 +25,109 @@ def run(code: List[int]) -> Dict[Point, int]:
     return render
 
 
-class ArcadeIO(IO):
-    W, H = 38, 26
-    _screen: List[List[str]]
-    _buf: List[int]
+class ArcadeIO:
+    """Arcade cabinet that follows the ball with the paddle.
 
-    def __init__(self):
-        self._screen = [[' ' for _ in range(ArcadeIO.W)] for _ in range(ArcadeIO.H)]
-        self._buf = []
+    Ball and paddle positions are tracked from the tile writes, so the
+    joystick needs no screen. The screen is only kept and painted, at most
+    fps times a second, when render is set. Score updates collect in
+    scores until taken.
+    """
+    W, H = 38, 26
+    BALL, PADDLE = 4, 3
+    TILES = b' #%=@'
+
+    ball_x: int
+    paddle_x: int
+    scores: List[int]
+    _screen: Optional[Framebuffer]
+
+    def __init__(self, render: bool = False, fps: Optional[float] = 30):
+        self.ball_x = 0
+        self.paddle_x = 0
+        self.scores = []
+        # The row below the board shows the score.
+        self._screen = Framebuffer(ArcadeIO.W, ArcadeIO.H + 1, fps) if render else None
+
+    def write_tiles(self, values: List[int]) -> None:
+        """Applies whole (x, y, tile) triples."""
+        screen = self._screen
+        for i in range(0, len(values), 3):
+            x, y, c = values[i:i+3]
+            if x < 0:
+                self.scores.append(c)
+                if screen is not None:
+                    screen.text(0, ArcadeIO.H, 'Score: %d' % c)
+                continue
+            if c == ArcadeIO.BALL:
+                self.ball_x = x
+            elif c == ArcadeIO.PADDLE:
+                self.paddle_x = x
+            if screen is not None:
+                screen[x, y] = ArcadeIO.TILES[c]
 
-    def write_output(self, value: int) -> None:
-        self._buf.append(value)
-        if len(self._buf) < 3:
+    def read_input(self) -> int:
+        if self._screen is not None:
+            self._screen.paint()
+        return (self.ball_x > self.paddle_x) - (self.ball_x < self.paddle_x)
+
+    def close(self) -> None:
+        if self._screen is not None:
+            self._screen.close()
+
+
+def play(code: List[int], render: bool = False, fps: Optional[float] = 30,
+         engine: Callable[[List[int]], Machine] = CompiledMachine) -> Iterator[int]:
+    """Plays the game to the end, yielding each score update."""
+    io = ArcadeIO(render, fps)
+    mac = engine(code)
+    inbox = RingBuffer()
+    # A multiple of 3, so a full outbox holds whole triples.
+    outbox = RingBuffer(3 * 1024)
+    while True:
+        interrupt = mac.pump(inbox, outbox)
+        io.write_tiles(outbox.read())
+        yield from io.scores
+        io.scores.clear()
+        if interrupt is None:
+            io.close()
             return
-        x, y, c = self._buf
-        self._buf = []
-        if x < 0:
-            print('Score: %d' % c)
-        else:
-            self._screen[y][x] = ' #%=@'[c]
+        if isinstance(interrupt, InputInterrupt):
+            inbox.push(io.read_input())
 
-    def read_input(self) -> int:
-        self._render()
-        d = self._find_mark_x('@') - self._find_mark_x('=')
-        if d == 0:
-            return 0
-        if d > 0:
-            return 1
-        return -1
-
-    def _render(self) -> None:
-        for row in self._screen:
-            print(''.join(row))
-        print('')
-
-    def _find_mark_x(self, mark: str) -> int:
-        for row in self._screen:
-            for x, c in enumerate(row):
-                if c == mark:
-                    return x
-        raise Exception('Mark %s not found' % mark)
+
+# Moves the ball right of the paddle, then above it, and scores 7 if the
+# joystick reads 1 and then 0.
+_GAME = [
+    104, 2, 104, 5, 104, 3,  # paddle at (2, 5)
+    104, 4, 104, 4, 104, 4,  # ball at (4, 4)
+    3, 100, 1008, 100, 1, 101, 1005, 101, 22, 99,
+    104, 3, 104, 4, 104, 4,  # ball at (3, 4)
+    104, 3, 104, 5, 104, 3,  # paddle at (3, 5)
+    3, 100, 1008, 100, 0, 101, 1005, 101, 44, 99,
+    104, -1, 104, 0, 104, 7,
+    99,
+]
+
+
+def test_play():
+    assert list(play(_GAME, engine=Machine)) == [7]
+    assert list(play(_GAME)) == [7]
 
 
 def main():
     with open('input.txt') as f:
         code = [int(s) for s in f.read().strip().split(',')]
-    mem = Memory(code)
-    mem[0] = 2  # two coins
-    mac = Machine(mem, ArcadeIO())
-    mac.run()
+    code[0] = 2  # two coins
+    args = sys.argv[1:]
+    if '--render' in args:
+        # Frames stay on screen; the score is shown below the board.
+        fps = float(args[args.index('--fps') + 1]) if '--fps' in args else 30
+        for _ in play(code, render=True, fps=fps):
+            pass
+        return
+    for score in play(code):
+        print('Score: %d' % score)
 
 
 if __name__ == '__main__':
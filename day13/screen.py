@@ -0,0 +1,168 @@
+import io
+import sys
+import time
+from typing import Callable, Optional, TextIO
+
+
+class Framebuffer:
+    """Character screen that repaints only what changed.
+
+    Cells are bytes in a bytearray, alongside a copy of what the terminal
+    last showed. Writes mark their row dirty; paint() compares dirty rows
+    against the shown copy and emits ANSI cursor moves and the changed runs
+    only. With fps set, paint() skips frames that come sooner than 1/fps
+    after the previous one, so a fast producer is not held up by the
+    terminal.
+    """
+    width: int
+    height: int
+    frames: int
+    _cells: bytearray
+    _shown: bytearray
+    _dirty: bytearray
+    _out: TextIO
+    _interval: float
+    _clock: Callable[[], float]
+    _last: Optional[float]
+
+    def __init__(self, width: int, height: int, fps: Optional[float] = 30, out: Optional[TextIO] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.width = width
+        self.height = height
+        self.frames = 0
+        self._cells = bytearray(b' ' * (width * height))
+        self._shown = bytearray(self._cells)
+        self._dirty = bytearray(height)
+        self._out = sys.stdout if out is None else out
+        self._interval = 1 / fps if fps else 0
+        self._clock = clock
+        self._last = None
+
+    def __getitem__(self, xy) -> int:
+        x, y = xy
+        return self._cells[self._index(x, y)]
+
+    def __setitem__(self, xy, ch: int) -> None:
+        x, y = xy
+        i = self._index(x, y)
+        if self._cells[i] != ch:
+            self._cells[i] = ch
+            self._dirty[y] = 1
+
+    def text(self, x: int, y: int, s: str) -> None:
+        """Writes s from (x, y), clipped to the row."""
+        i = self._index(x, y)
+        data = s.encode('latin-1')[:self.width - x]
+        if self._cells[i:i + len(data)] != data:
+            self._cells[i:i + len(data)] = data
+            self._dirty[y] = 1
+
+    def row(self, y: int) -> str:
+        return self._cells[y * self.width:(y + 1) * self.width].decode('latin-1')
+
+    def paint(self, force: bool = False) -> bool:
+        """Brings the terminal up to date, unless too soon after the last
+        frame. Returns whether a frame was drawn."""
+        now = self._clock()
+        if self._last is None:
+            # Start from a cleared screen, which matches the blank _shown.
+            self._out.write('\x1b[2J')
+        elif not force and now - self._last < self._interval:
+            return False
+        self._last = now
+        self._out.write(self._diff())
+        self._out.flush()
+        self.frames += 1
+        return True
+
+    def close(self) -> None:
+        """Paints the final frame and moves the cursor below the screen."""
+        self.paint(force=True)
+        self._out.write('\x1b[%dH\n' % (self.height + 1))
+        self._out.flush()
+
+    def _index(self, x: int, y: int) -> int:
+        # Unchecked, x past the width would land in the next row.
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError('Cell (%d, %d) is off the %dx%d screen' % (x, y, self.width, self.height))
+        return y * self.width + x
+
+    def _diff(self) -> str:
+        w = self.width
+        cells = self._cells
+        shown = self._shown
+        parts = []
+        for y in range(self.height):
+            if not self._dirty[y]:
+                continue
+            self._dirty[y] = 0
+            base = y * w
+            x = 0
+            while x < w:
+                if cells[base + x] == shown[base + x]:
+                    x += 1
+                    continue
+                start = x
+                while x < w and cells[base + x] != shown[base + x]:
+                    x += 1
+                parts.append('\x1b[%d;%dH' % (y + 1, start + 1))
+                parts.append(cells[base + start:base + x].decode('latin-1'))
+            shown[base:base + w] = cells[base:base + w]
+        return ''.join(parts)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_paint():
+    out = io.StringIO()
+    clock = _Clock()
+    fb = Framebuffer(5, 3, fps=10, out=out, clock=clock)
+    fb[1, 1] = ord('#')
+    fb[2, 1] = ord('#')
+    fb[4, 2] = ord('@')
+    assert fb.paint()
+    assert out.getvalue() == '\x1b[2J\x1b[2;2H##\x1b[3;5H@'
+
+    # Unchanged and rewritten-with-same-value cells are not repainted.
+    out.seek(0)
+    out.truncate()
+    clock.now = 1.0
+    fb[1, 1] = ord('#')
+    fb[2, 1] = ord(' ')
+    assert fb.paint()
+    assert out.getvalue() == '\x1b[2;3H '
+    assert fb.row(1) == ' #   '
+
+
+def test_fps():
+    out = io.StringIO()
+    clock = _Clock()
+    fb = Framebuffer(4, 1, fps=10, out=out, clock=clock)
+    fb.paint()
+    fb.text(0, 0, 'ab')
+    clock.now = 0.05
+    assert not fb.paint()
+    clock.now = 0.1
+    fb.text(1, 0, 'cdef')
+    assert fb.paint()
+    assert fb.row(0) == 'acde'
+    assert out.getvalue() == '\x1b[2J\x1b[1;1Hacde'
+    assert fb.frames == 2
+
+
+def test_bounds():
+    fb = Framebuffer(4, 2, out=io.StringIO())
+    for x, y in [(4, 0), (0, 2), (-1, 0), (0, -1)]:
+        try:
+            fb[x, y] = ord('#')
+        except IndexError:
+            pass
+        else:
+            assert False, 'Wrote off-screen cell (%d, %d)' % (x, y)
+    assert fb.row(1) == '    '
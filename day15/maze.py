@@ -0,0 +1,327 @@
+import collections
+import enum
+import os
+import sys
+import typing
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from intcode import Machine
+
+
+class Point(typing.NamedTuple):
+    x: int
+    y: int
+
+    def __add__(self, other: 'Point') -> 'Point':
+        return Point(self.x + other.x, self.y + other.y)
+
+
+Point.ZERO = Point(0, 0)
+
+
+class Direction(enum.Enum):
+    N = 1
+    S = 2
+    W = 3
+    E = 4
+
+    @staticmethod
+    def all() -> List['Direction']:
+        return [Direction.N, Direction.S, Direction.W, Direction.E]
+
+    def flip(self) -> 'Direction':
+        if self == Direction.N:
+            return Direction.S
+        if self == Direction.S:
+            return Direction.N
+        if self == Direction.W:
+            return Direction.E
+        if self == Direction.E:
+            return Direction.W
+        raise Exception('Unknown direction %s' % self)
+
+    def delta(self) -> Point:
+        if self == Direction.N:
+            return Point(0, -1)
+        if self == Direction.S:
+            return Point(0, +1)
+        if self == Direction.W:
+            return Point(-1, 0)
+        if self == Direction.E:
+            return Point(+1, 0)
+        raise Exception('Unknown direction %s' % self)
+
+
+class Maze:
+    """Explored map as a grid of cell characters in a bytearray.
+
+    Points are relative to the droid's start; cells outside the explored
+    area read as UNKNOWN. Every open cell has all four neighbours explored,
+    so open cells never touch the grid border.
+    """
+    WALL, FLOOR, OXYGEN, UNKNOWN = b'#.$ '
+    width: int
+    height: int
+    # Grid position of the droid's start.
+    origin: Point
+    cells: bytearray
+    # Droid moves it took to explore.
+    moves: int
+
+    def __init__(self, cells: Dict[Point, int], moves: int = 0):
+        x0 = min(p.x for p in cells)
+        y0 = min(p.y for p in cells)
+        self.width = max(p.x for p in cells) - x0 + 1
+        self.height = max(p.y for p in cells) - y0 + 1
+        self.origin = Point(-x0, -y0)
+        self.cells = bytearray([Maze.UNKNOWN]) * (self.width * self.height)
+        for p, c in cells.items():
+            self.cells[self._index(p)] = c
+        self.moves = moves
+
+    def __getitem__(self, p: Point) -> int:
+        x = p.x + self.origin.x
+        y = p.y + self.origin.y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return Maze.UNKNOWN
+
+    @property
+    def oxygen(self) -> Optional[Point]:
+        i = self.cells.find(Maze.OXYGEN)
+        return None if i < 0 else self._point(i)
+
+    def distances(self, source: Point) -> Dict[Point, int]:
+        """Returns the number of steps from source to every reachable cell."""
+        return {self._point(i): d for i, d in self._bfs(self._index(source)).items()}
+
+    def distance(self, a: Point, b: Point) -> int:
+        d = self._bfs(self._index(a), self._index(b)).get(self._index(b))
+        if d is None:
+            raise Exception('%s is not reachable from %s' % (b, a))
+        return d
+
+    def fill_time(self, source: Point) -> int:
+        """Steps until a fill spreading from source reaches every cell."""
+        return int(self.distance_map(source).max())
+
+    def occupancy(self) -> np.ndarray:
+        """Returns a (height, width) bool array, True on open cells."""
+        grid = np.frombuffer(bytes(self.cells), dtype=np.uint8).reshape(self.height, self.width)
+        return (grid == Maze.FLOOR) | (grid == Maze.OXYGEN)
+
+    def distance_map(self, *sources: Point) -> np.ndarray:
+        """Returns steps from the nearest source for every grid cell, -1
+        where unreachable. Index it with [y + origin.y, x + origin.x]."""
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        for p in sources:
+            mask[p.y + self.origin.y, p.x + self.origin.x] = True
+        return distance_transform(self.occupancy(), mask)
+
+    def render(self) -> str:
+        w = self.width
+        return '\n'.join(self.cells[y * w:(y + 1) * w].decode('ascii') for y in range(self.height))
+
+    def _index(self, p: Point) -> int:
+        return (p.y + self.origin.y) * self.width + p.x + self.origin.x
+
+    def _point(self, i: int) -> Point:
+        return Point(i % self.width - self.origin.x, i // self.width - self.origin.y)
+
+    def _bfs(self, source: int, target: Optional[int] = None) -> Dict[int, int]:
+        cells = self.cells
+        steps = (-self.width, self.width, -1, 1)
+        dist = {source: 0}
+        queue = collections.deque([source])
+        while queue:
+            i = queue.popleft()
+            if i == target:
+                break
+            d = dist[i] + 1
+            for step in steps:
+                j = i + step
+                if j not in dist and cells[j] != Maze.WALL:
+                    dist[j] = d
+                    queue.append(j)
+        return dist
+
+
+def distance_transform(occupancy: np.ndarray, sources: np.ndarray) -> np.ndarray:
+    """Multi-source BFS over a bool grid of open cells.
+
+    The frontier is kept as an array of flat indices into the grid padded
+    with a closed border, so the neighbours of every frontier cell are
+    index +-1 and +-width without bounds checks. Each level costs a few
+    vectorized operations on the frontier alone, so corridor mazes with
+    thousands of narrow levels stay close to a plain BFS. Returns an int
+    array of steps from the nearest open source, -1 where unreachable.
+    """
+    h, w = occupancy.shape
+    # Open cells not yet reached.
+    free = np.pad(occupancy, 1).ravel()
+    dist = np.full(free.shape, -1, dtype=np.int64)
+    steps = np.array([-w - 2, -1, 1, w + 2])
+    frontier = np.flatnonzero(np.pad(sources & occupancy, 1))
+    d = 0
+    while frontier.size:
+        free[frontier] = False
+        dist[frontier] = d
+        grown = (frontier[:, None] + steps).ravel()
+        frontier = np.unique(grown[free[grown]])
+        d += 1
+    return dist.reshape(h + 2, w + 2)[1:-1, 1:-1]
+
+
+_TILES = (Maze.WALL, Maze.FLOOR, Maze.OXYGEN)
+
+
+def explore(move: Callable[[Direction], int]) -> Maze:
+    """Maps everything reachable from the droid's position depth-first.
+
+    move sends the droid one step and returns its status. The droid only
+    steps back along the edge it came in by, so every open edge is walked
+    at most twice and mapping costs O(cells) moves.
+    """
+    moves = 0
+    cells = {Point.ZERO: Maze.FLOOR}
+    # Position, directions still to try and the direction leading back.
+    stack = [(Point.ZERO, Direction.all(), None)]
+    while stack:
+        pos, todo, back = stack[-1]
+        if not todo:
+            stack.pop()
+            if back is not None:
+                moves += 1
+                if move(back) == 0:
+                    raise Exception('Droid cannot step back to %s' % (pos + back.delta()))
+            continue
+        dir = todo.pop()
+        next_pos = pos + dir.delta()
+        if next_pos in cells:
+            continue
+        moves += 1
+        result = move(dir)
+        cells[next_pos] = _TILES[result]
+        if result:
+            stack.append((next_pos, Direction.all(), dir.flip()))
+    return Maze(cells, moves)
+
+
+def droid(code: List[int], engine: Callable[[List[int]], Machine] = Machine) -> Callable[[Direction], int]:
+    """Returns a move function for a repair droid running code."""
+    mac = engine(code)
+
+    def move(dir: Direction) -> int:
+        return mac.interact([dir.value], 1)[0]
+
+    return move
+
+
+_MAP = '''\
+ ##   
+#..## 
+#.#..#
+#.$.# 
+ ###  '''
+
+
+class _Droid:
+    # Walks _MAP from the cell left of the oxygen system.
+    def __init__(self):
+        self.rows = _MAP.split('\n')
+        self.pos = Point(1, 3)
+        self.moves = 0
+
+    def __call__(self, dir: Direction) -> int:
+        self.moves += 1
+        p = self.pos + dir.delta()
+        c = self.rows[p.y][p.x]
+        assert c != ' '
+        if c == '#':
+            return 0
+        self.pos = p
+        return 1 if c == '.' else 2
+
+
+def test_explore():
+    walker = _Droid()
+    maze = explore(walker)
+    assert maze.render() == _MAP
+    assert maze.moves == walker.moves
+    # Back where it started.
+    assert walker.pos == Point(1, 3)
+    # 7 open cells besides the start, each entered and left once, and 13
+    # walls bumped into once each.
+    assert maze.moves == 2 * 7 + 13
+    assert maze.oxygen == Point(1, 0)
+    assert maze.distance(Point.ZERO, maze.oxygen) == 1
+    assert maze.distance(Point(0, -2), maze.oxygen) == 3
+    assert maze.fill_time(maze.oxygen) == 4
+    assert maze[Point(-1, 0)] == Maze.WALL
+    assert maze[Point(10, 10)] == Maze.UNKNOWN
+
+
+def test_distance_map():
+    maze = explore(_Droid())
+    dist = maze.distance_map(maze.oxygen)
+    expected = maze.distances(maze.oxygen)
+    for y in range(maze.height):
+        for x in range(maze.width):
+            p = Point(x - maze.origin.x, y - maze.origin.y)
+            assert dist[y, x] == expected.get(p, -1), p
+    # Two sources: every cell takes the nearer one.
+    both = maze.distance_map(maze.oxygen, Point(0, -2))
+    assert dist[1, 2] == 4 and both[1, 2] == 1
+    assert both.max() == 3
+
+
+def test_distance_transform():
+    rng = np.random.default_rng(15)
+    occupancy = rng.random((40, 60)) < 0.7
+    sources = np.zeros_like(occupancy)
+    sources[3, 5] = sources[30, 50] = True
+    assert (distance_transform(occupancy, sources) == _grid_bfs(occupancy, sources)).all()
+
+
+def test_distance_transform_maze():
+    # A perfect maze: one long corridor tree with a level per step.
+    rng = np.random.default_rng(15)
+    occupancy = np.zeros((41, 61), dtype=bool)
+    occupancy[1, 1] = True
+    stack = [(1, 1)]
+    while stack:
+        y, x = stack[-1]
+        nexts = [(y + dy, x + dx) for dy, dx in ((-2, 0), (2, 0), (0, -2), (0, 2))
+                 if 0 < y + dy < 40 and 0 < x + dx < 60 and not occupancy[y + dy, x + dx]]
+        if not nexts:
+            stack.pop()
+            continue
+        ny, nx = nexts[rng.integers(len(nexts))]
+        occupancy[(y + ny) // 2, (x + nx) // 2] = occupancy[ny, nx] = True
+        stack.append((ny, nx))
+    sources = np.zeros_like(occupancy)
+    sources[1, 1] = sources[39, 59] = True
+    dist = distance_transform(occupancy, sources)
+    assert (dist == _grid_bfs(occupancy, sources)).all()
+    assert dist.max() > 100
+
+
+def _grid_bfs(occupancy: np.ndarray, sources: np.ndarray) -> np.ndarray:
+    """Plain BFS to check distance_transform against."""
+    h, w = occupancy.shape
+    dist = np.full(occupancy.shape, -1, dtype=np.int64)
+    queue = collections.deque()
+    for y, x in zip(*np.nonzero(sources & occupancy)):
+        dist[y, x] = 0
+        queue.append((y, x))
+    while queue:
+        y, x = queue.popleft()
+        for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+            if 0 <= ny < h and 0 <= nx < w and occupancy[ny, nx] and dist[ny, nx] < 0:
+                dist[ny, nx] = dist[y, x] + 1
+                queue.append((ny, nx))
+    return dist
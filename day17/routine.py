@@ -0,0 +1,112 @@
+import functools
+import typing
+from typing import List, Optional, Sequence, Tuple
+
+
+class Program(typing.NamedTuple):
+    # Function indices called by the main routine, in order.
+    main: Tuple[int, ...]
+    # Moves of each movement function, such as 'L,6'.
+    functions: Tuple[Tuple[str, ...], ...]
+
+    def lines(self) -> List[str]:
+        names = ','.join('ABC'[i] for i in self.main)
+        return [names] + [','.join(f) for f in self.functions]
+
+    @property
+    def cost(self) -> int:
+        return sum(len(line) for line in self.lines())
+
+    def text(self, video: bool = False) -> str:
+        """Returns the robot's input.
+
+        The robot reads all three functions and rejects empty ones, so
+        unused names repeat A, which main never calls under them.
+        """
+        lines = self.lines()
+        lines += lines[1:2] * (4 - len(lines))
+        return '\n'.join(lines + ['y' if video else 'n']) + '\n'
+
+
+def compress(moves: Sequence[str], functions: int = 3, limit: int = 20) -> Optional[Program]:
+    """Splits moves into a main routine over up to functions movement
+    functions, each line at most limit characters, and returns the
+    shortest such program.
+
+    Functions are numbered in order of first call. The search memoizes on
+    (position, functions so far, calls so far) and prunes functions once
+    their text passes limit and mains once they run out of calls.
+    """
+    moves = tuple(moves)
+    max_calls = (limit + 1) // 2
+
+    @functools.lru_cache(maxsize=None)
+    def search(pos: int, funcs: Tuple[Tuple[str, ...], ...], calls: int) -> Optional[Program]:
+        if pos == len(moves):
+            return Program((), funcs)
+        if calls == max_calls:
+            return None
+        options = []
+        for i, f in enumerate(funcs):
+            if moves[pos:pos + len(f)] == f:
+                options.append((i, funcs))
+        if len(funcs) < functions:
+            size = -1
+            for end in range(pos + 1, len(moves) + 1):
+                size += len(moves[end - 1]) + 1
+                if size > limit:
+                    break
+                options.append((len(funcs), funcs + (moves[pos:end],)))
+        best = None
+        for i, next_funcs in options:
+            rest = search(pos + len(next_funcs[i]), next_funcs, calls + 1)
+            if rest is None:
+                continue
+            program = Program((i,) + rest.main, rest.functions)
+            if best is None or program.cost < best.cost:
+                best = program
+        return best
+
+    return search(0, (), 0)
+
+
+def expand(program: Program) -> List[str]:
+    return [move for i in program.main for move in program.functions[i]]
+
+
+def _robot_accepts(text: str) -> bool:
+    """Parses text the way the vacuum robot reads its input: a main routine
+    over A, B and C, three non-empty functions of turns and distances, each
+    at most 20 characters, then the video flag."""
+    lines = text.split('\n')
+    if len(lines) != 6 or lines[4] not in ('y', 'n') or lines[5]:
+        return False
+    if any(len(line) > 20 for line in lines[:4]):
+        return False
+    if not all(name in ('A', 'B', 'C') for name in lines[0].split(',')):
+        return False
+    for line in lines[1:4]:
+        tokens = line.split(',')
+        if len(tokens) % 2 or not all(
+                t in ('L', 'R') if k % 2 == 0 else t.isdigit() for k, t in enumerate(tokens)):
+            return False
+    return True
+
+
+def test_compress():
+    moves = 'R,8 R,8 R,4 R,4 R,8 L,6 L,2 R,4 R,4 R,8 R,8 R,8 L,6 L,2'.split()
+    program = compress(moves)
+    assert expand(program) == moves
+    assert all(len(line) <= 20 for line in program.lines())
+    assert _robot_accepts(program.text())
+    assert program.text(video=True).endswith('\ny\n')
+
+
+def test_compress_cheapest():
+    moves = ['L,1', 'L,2'] * 6
+    # Six calls of a short function beat three of a longer one.
+    assert compress(moves).lines() == ['A,A,A,A,A,A', 'L,1,L,2']
+    assert _robot_accepts(compress(moves).text())
+    moves = ['L,%d' % i for i in range(1, 20)]
+    assert compress(moves) is None
+    assert expand(compress(moves, limit=40)) == moves
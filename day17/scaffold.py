@@ -0,0 +1,149 @@
+import bisect
+import collections
+import typing
+from typing import Dict, List
+
+import numpy as np
+
+
+class Point(typing.NamedTuple):
+    i: int
+    j: int
+
+
+class Segment(typing.NamedTuple):
+    # 'L' or 'R', the turn made before moving.
+    turn: str
+    length: int
+    start: Point
+    end: Point
+
+
+# Up, left, down, right: turning left is +1.
+_ADJ = (
+    (-1, 0),
+    (0, -1),
+    (+1, 0),
+    (0, +1),
+)
+_ROBOT = {'^': 0, '<': 1, 'v': 2, '>': 3}
+
+
+class Scaffold:
+    """Segment graph of a camera image.
+
+    Neighbour masks are computed for the whole image at once, from which
+    come the intersections and the turn nodes: scaffold cells the robot
+    cannot pass straight through. Turn nodes are indexed by row and by
+    column, so each segment of the route ends at the nearest turn node
+    ahead and the route costs O(segments) lookups.
+    """
+    intersections: List[Point]
+    segments: List[Segment]
+    robot: Point
+    _rows: Dict[int, List[int]]
+    _cols: Dict[int, List[int]]
+    _scaffold: np.ndarray
+
+    def __init__(self, image: str):
+        lines = image.strip().splitlines()
+        w = max(len(line) for line in lines)
+        chars = np.array([list(line.ljust(w, '.')) for line in lines])
+        # A border of empty cells keeps the shifts in bounds.
+        s = np.pad(chars != '.', 1)
+        self._scaffold = s
+        up, down = s[:-2, 1:-1], s[2:, 1:-1]
+        left, right = s[1:-1, :-2], s[1:-1, 2:]
+        core = s[1:-1, 1:-1]
+        cross = core & up & down & left & right
+        straight = (up & down & ~left & ~right) | (left & right & ~up & ~down)
+        self.intersections = [Point(int(i), int(j)) for i, j in zip(*np.nonzero(cross))]
+
+        rows = collections.defaultdict(list)
+        cols = collections.defaultdict(list)
+        # np.nonzero yields row-major order, so both lists come out sorted.
+        for i, j in zip(*np.nonzero(core & ~cross & ~straight)):
+            rows[int(i)].append(int(j))
+            cols[int(j)].append(int(i))
+        self._rows = dict(rows)
+        self._cols = dict(cols)
+
+        robots = np.nonzero(np.isin(chars, list(_ROBOT)))
+        if len(robots[0]) != 1:
+            raise Exception('Expected one robot, found %d' % len(robots[0]))
+        self.robot = Point(int(robots[0][0]), int(robots[1][0]))
+        self.segments = self._trace(_ROBOT[chars[self.robot]])
+
+    def alignment(self) -> int:
+        return sum(p.i * p.j for p in self.intersections)
+
+    def route(self) -> List[str]:
+        """Returns the moves, such as 'L,6', that follow the scaffold to its end."""
+        return ['%s,%d' % (seg.turn, seg.length) for seg in self.segments]
+
+    def _on(self, i: int, j: int) -> bool:
+        return bool(self._scaffold[i + 1, j + 1])
+
+    def _trace(self, cdir: int) -> List[Segment]:
+        segments = []
+        pos = self.robot
+        while True:
+            for turn in (1, 3):
+                ndir = (cdir + turn) % 4
+                di, dj = _ADJ[ndir]
+                if self._on(pos.i + di, pos.j + dj):
+                    break
+            else:
+                return segments
+            end = self._next_node(pos, di, dj)
+            segments.append(Segment('L' if turn == 1 else 'R', abs(end.i - pos.i) + abs(end.j - pos.j), pos, end))
+            pos = end
+            cdir = ndir
+
+    def _next_node(self, pos: Point, di: int, dj: int) -> Point:
+        if di:
+            line, at, step = self._cols[pos.j], pos.i, di
+        else:
+            line, at, step = self._rows[pos.i], pos.j, dj
+        k = bisect.bisect_right(line, at) if step > 0 else bisect.bisect_left(line, at) - 1
+        if not 0 <= k < len(line):
+            raise Exception('Scaffold from %s runs off the map' % (pos,))
+        return Point(line[k], pos.j) if di else Point(pos.i, line[k])
+
+
+_EXAMPLE = """\
+#######...#####
+#.....#...#...#
+#.....#...#...#
+......#...#...#
+......#...###.#
+......#.....#.#
+^########...#.#
+......#.#...#.#
+......#########
+........#...#..
+....#########..
+....#...#......
+....#...#......
+....#...#......
+....#####......"""
+
+
+def test_route():
+    scaffold = Scaffold(_EXAMPLE)
+    assert ','.join(scaffold.route()) == 'R,8,R,8,R,4,R,4,R,8,L,6,L,2,R,4,R,4,R,8,R,8,R,8,L,6,L,2'
+    assert scaffold.segments[0] == Segment('R', 8, Point(6, 0), Point(6, 8))
+    assert scaffold.robot == Point(6, 0)
+
+
+def test_alignment():
+    scaffold = Scaffold("""
+..#..........
+..#..........
+#######...###
+#.#...#...#.#
+#############
+..#...#...#..
+..#####...^..""")
+    assert sorted(scaffold.intersections) == [(2, 2), (4, 2), (4, 6), (4, 10)]
+    assert scaffold.alignment() == 76
@@ -0,0 +1,198 @@
+import bisect
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BeamScanner:
+    """Tractor beam geometry from as few probes as possible.
+
+    The beam is a wedge starting at the origin: every row holds one run of
+    pulled cells, and both its edges grow roughly linearly with y. A row is
+    located by scaling the nearest known row to it, and its edges are then
+    found by galloping and binary search, so a row costs O(log width)
+    probes. Rows below first_row, where the beam is too thin to scale
+    reliably, are scanned linearly. A thin beam can miss whole rows; those
+    are kept as None.
+    """
+    _pulled: Callable[[int, int], bool]
+    _first_row: int
+    # Pulled cells of each known row as a half-open range [xl, xh), or
+    # None for an empty row.
+    _rows: Dict[int, Optional[Tuple[int, int]]]
+    # Known non-empty rows from first_row on, sorted.
+    _known: List[int]
+    probes: int
+
+    def __init__(self, pulled: Callable[[int, int], bool], first_row: int = 10):
+        self._pulled = pulled
+        self._first_row = first_row
+        self._rows = {}
+        self._known = []
+        self.probes = 0
+
+    def probe(self, x: int, y: int) -> bool:
+        self.probes += 1
+        return self._pulled(x, y)
+
+    def row(self, y: int) -> Optional[Tuple[int, int]]:
+        """Returns the pulled cells of row y as a half-open range, or None
+        if the row is empty."""
+        if y in self._rows:
+            return self._rows[y]
+        if y < self._first_row:
+            bounds = self._scan_small(y)
+        elif not self._known:
+            bounds = self._scan(y, 0, 100 * (y + 1))
+        else:
+            bounds = self._search(y)
+        self._rows[y] = bounds
+        if y >= self._first_row and bounds is not None:
+            bisect.insort(self._known, y)
+        return bounds
+
+    def area(self, size: int) -> int:
+        """Counts pulled cells with 0 <= x, y < size."""
+        total = 0
+        for y in range(size):
+            bounds = self.row(y)
+            if bounds is not None:
+                xl, xh = bounds
+                total += max(0, min(xh, size) - xl)
+        return total
+
+    def fit(self, size: int) -> Tuple[int, int]:
+        """Returns the top-left corner of the first size x size square in the
+        beam, ordered by its bottom row."""
+        y = size - 1
+        # Near the origin rounding dominates, so walk the first rows.
+        while y < self._first_row + size:
+            if self._fits(y, size):
+                return self._corner(y, size)
+            y += 1
+        low = y
+        step = 1
+        while not self._fits(low + step, size):
+            low += step
+            step *= 2
+        high = low + step
+        while high - low > 1:
+            mid = (low + high) // 2
+            if self._fits(mid, size):
+                high = mid
+            else:
+                low = mid
+        # Rounding makes _fits jitter near the threshold, so earlier rows
+        # may still fit. The edges are lines x = a * y and x = c * y through
+        # the origin, each found within one cell. _fits(y) therefore tests
+        # L(y) = c * (y - size + 1) - a * y >= size to within 2. A fit at y
+        # needs L(y) > size - 2, and the miss at high - 1 means
+        # L(high - 1) < size + 2. L grows by c - a per row, so only rows
+        # with high - y < 4 / (c - a) + 1 can fit. The width of row high is
+        # within 2 of (c - a) * high, so c - a > (width - 2) / high.
+        xl, xh = self.row(high)
+        window = math.ceil(4 * high / max(1, xh - xl - 2)) + 1
+        for y in range(max(self._first_row + size, high - window), high):
+            if self._fits(y, size):
+                return self._corner(y, size)
+        return self._corner(high, size)
+
+    def contains_square(self, x: int, y: int, size: int) -> bool:
+        """Checks a square by its corners, which suffices for a convex beam."""
+        return all(self.probe(cx, cy) for cx in (x, x + size - 1) for cy in (y, y + size - 1))
+
+    def _fits(self, bottom: int, size: int) -> bool:
+        low = self.row(bottom)
+        high = self.row(bottom - size + 1)
+        if low is None or high is None:
+            return False
+        return high[1] - low[0] >= size
+
+    def _corner(self, bottom: int, size: int) -> Tuple[int, int]:
+        bounds = self.row(bottom)
+        if bounds is None:
+            raise Exception('Row %d is empty' % bottom)
+        return bounds[0], bottom - size + 1
+
+    def _scan(self, y: int, start: int, stop: int) -> Optional[Tuple[int, int]]:
+        x = start
+        while x < stop and not self.probe(x, y):
+            x += 1
+        if x == stop:
+            return None
+        xl = x
+        while x < stop and self.probe(x, y):
+            x += 1
+        return xl, x
+
+    def _scan_small(self, y: int) -> Optional[Tuple[int, int]]:
+        top = self.row(self._first_row)
+        stop = math.ceil((y + 1) * top[1] / self._first_row) + 2 if top is not None else 100 * (y + 1)
+        return self._scan(y, 0, stop)
+
+    def _search(self, y: int) -> Optional[Tuple[int, int]]:
+        i = bisect.bisect_left(self._known, y)
+        near = min(self._known[max(0, i - 1):i + 1], key=lambda r: abs(r - y))
+        nxl, nxh = self._rows[near]
+        scale = y / near
+        guess_xl = int(nxl * scale)
+        guess_xh = int(nxh * scale)
+        inside = (guess_xl + guess_xh) // 2
+        if not self.probe(inside, y):
+            # A thin beam may miss the row entirely.
+            return self._scan(y, max(0, guess_xl - 2), guess_xh + 2)
+        xl = self._edge(y, inside, guess_xl - 1, -1)
+        xh = self._edge(y, inside, guess_xh, 1) + 1
+        return xl, xh
+
+    def _edge(self, y: int, inside: int, guess: int, step: int) -> int:
+        """Returns the last pulled x from inside in direction step.
+
+        guess estimates the first x past the edge; x = -1 counts as outside.
+        """
+        outside = guess if (guess - inside) * step > 0 else inside + step
+        while outside >= 0 and self.probe(outside, y):
+            inside, outside = outside, outside + 2 * (outside - inside)
+        outside = max(outside, -1)
+        while abs(outside - inside) > 1:
+            mid = (inside + outside) // 2
+            if self.probe(mid, y):
+                inside = mid
+            else:
+                outside = mid
+        return inside
+
+
+def _wedge(x: int, y: int) -> bool:
+    # Pulled where 0.9 y <= x <= (9 y - 1) / 7, plus the origin.
+    return 9 * y <= 10 * x and 9 * y >= 7 * x + 1 or (x, y) == (0, 0)
+
+
+def test_row():
+    scanner = BeamScanner(_wedge)
+    for y in [10, 500, 11, 0, 1, 3, 250, 10000]:
+        xs = [x for x in range(2 * y + 3) if _wedge(x, y)]
+        expected = (xs[0], xs[-1] + 1) if xs else None
+        assert scanner.row(y) == expected, y
+    assert scanner.probes < 300
+
+
+def _thin(lo: float, hi: float) -> Callable[[int, int], bool]:
+    # A wedge narrow enough to leave rows empty well past first_row.
+    return lambda x, y: lo * y <= x <= hi * y
+
+
+def test_area_and_fit():
+    # Brute force gets slow on thin wedges, whose squares sit far out.
+    for pulled, sizes in [(_wedge, [1, 2, 3, 20]), (_thin(1.116, 1.22), [1, 2, 3]), (_thin(1.464, 1.519), [1, 2, 3])]:
+        scanner = BeamScanner(pulled)
+        assert scanner.area(50) == sum(pulled(x, y) for x in range(50) for y in range(50))
+        for size in sizes:
+            x, y = scanner.fit(size)
+            assert all(pulled(cx, cy) for cx in range(x, x + size) for cy in range(y, y + size)), size
+            # No square fits with a smaller bottom row.
+            for bottom in range(size - 1, y + size - 1):
+                top = bottom - size + 1
+                assert not any(
+                    all(pulled(cx, cy) for cx in range(left, left + size) for cy in range(top, bottom + 1))
+                    for left in range(2 * bottom + 2))
+    assert BeamScanner(_thin(1.116, 1.22)).fit(2) == (27, 23)
@@ -0,0 +1,318 @@
+"""Springscript synthesis for the springdroid.
+
+Candidates are searched symbolically: a register's value over every
+sensor pattern is a truth table, stored as an int with bit p set when the
+register is true for pattern p, where sensor k reads ground when bit k of
+p is set. Programs are built in a canonical form where T only ever holds a
+freshly loaded literal, so the search state is J alone.
+
+Two facts about the hull prune candidates without running them: the
+droid lands on D, so a jump onto a hole always fails and J can be masked
+with D; and walking onto a hole at A always fails, so J must hold when A
+is a hole and D is ground.
+
+Runs on the VM are the expensive part. A failed run shows the hull the
+droid fell on, and a HullOracle replays later candidates over those hulls
+from their truth tables alone, so only candidates that survive every hull
+seen so far go to the VM.
+"""
+
+import functools
+import itertools
+import os
+import sys
+import typing
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from intcode import AsciiChannel, CompiledMachine, Machine
+from intcode.sweep import sweep
+
+SENSORS = 'ABCDEFGHI'
+MAX_INSTRUCTIONS = 15
+FAILED = "Didn't make it across"
+
+Program = Tuple[str, ...]
+
+
+class Mode(typing.NamedTuple):
+    command: str
+    # Number of sensors, from A.
+    sensors: int
+
+
+WALK = Mode('WALK', 4)
+RUN = Mode('RUN', 9)
+
+
+class Outcome(typing.NamedTuple):
+    # Hull damage reported once across, else None.
+    damage: Optional[int]
+    # Hull the droid fell on, as '#' and '.' from its start, else None.
+    hull: Optional[str]
+
+
+def sensor_tables(n: int) -> List[int]:
+    """Returns the truth table of each of the first n sensors."""
+    return [sum(1 << p for p in range(1 << n) if p >> k & 1) for k in range(n)]
+
+
+def truth_table(program: Sequence[str], n: int) -> int:
+    """Evaluates J over all patterns of the first n sensors."""
+    full = (1 << (1 << n)) - 1
+    regs = dict(zip(SENSORS, sensor_tables(n)))
+    regs['T'] = regs['J'] = 0
+    for instruction in program:
+        op, x, y = instruction.split()
+        if op == 'AND':
+            regs[y] &= regs[x]
+        elif op == 'OR':
+            regs[y] |= regs[x]
+        elif op == 'NOT':
+            regs[y] = full ^ regs[x]
+        else:
+            raise Exception('Unknown instruction %s' % instruction)
+    return regs['J']
+
+
+def text(program: Program, mode: Mode) -> str:
+    return '\n'.join(program + (mode.command,)) + '\n'
+
+
+# An instruction over sensor variables: (op, variable or register, register).
+_Step = Tuple[str, object, str]
+
+
+@functools.lru_cache(maxsize=None)
+def _shapes(k: int) -> List[Tuple[_Step, ...]]:
+    """Canonical programs over k sensor variables, where variable 0 is A and
+    variable 1 is D, one per distinct valid function, cheapest first.
+
+    Each includes the final AND D J.
+    """
+    size = 1 << k
+    full = (1 << size) - 1
+    tables = sensor_tables(k)
+    a, d = tables[0], tables[1]
+    # Steps rewriting J, each a function of the old J and the steps taken.
+    moves = [((('NOT', 'J', 'J'),), lambda j: full ^ j)]
+    for v, x in enumerate(tables):
+        moves.append(((('OR', v, 'J'),), lambda j, x=x: j | x))
+        moves.append(((('AND', v, 'J'),), lambda j, x=x: j & x))
+        moves.append(((('NOT', v, 'J'),), lambda j, x=x: full ^ x))
+        for load, lit in [((('NOT', v, 'T'),), full ^ x), ((('NOT', v, 'T'), ('NOT', 'T', 'T')), x)]:
+            moves.append((load + (('OR', 'T', 'J'),), lambda j, lit=lit: j | lit))
+            moves.append((load + (('AND', 'T', 'J'),), lambda j, lit=lit: j & lit))
+
+    limit = MAX_INSTRUCTIONS - 1
+    cost = {0: 0}
+    parent: Dict[int, Tuple[int, Tuple[_Step, ...]]] = {}
+    buckets = [[] for _ in range(limit + 1)]
+    buckets[0].append(0)
+    found = {}
+    shapes = []
+    for c in range(limit + 1):
+        for j in buckets[c]:
+            if cost[j] != c:
+                continue
+            f = j & d
+            if (full ^ a) & d & ~f == 0 and f not in found:
+                found[f] = True
+                steps = []
+                node = j
+                while node in parent:
+                    node, taken = parent[node]
+                    steps[:0] = taken
+                shapes.append(tuple(steps) + (('AND', 1, 'J'),))
+            for taken, apply in moves:
+                nc = c + len(taken)
+                nj = apply(j)
+                if nc <= limit and cost.get(nj, limit + 1) > nc:
+                    cost[nj] = nc
+                    parent[nj] = (j, taken)
+                    buckets[nc].append(nj)
+    shapes.sort(key=len)
+    return shapes
+
+
+def candidates(mode: Mode) -> Iterator[Program]:
+    """Yields programs with distinct behaviour, using as few sensors and
+    then as few instructions as possible."""
+    n = mode.sensors
+    others = SENSORS[:n].replace('A', '').replace('D', '')
+    seen = set()
+    for k in range(2, n + 1):
+        for subset in itertools.combinations(others, k - 2):
+            names = ('A', 'D') + subset
+            for shape in _shapes(k):
+                program = tuple(
+                    '%s %s %s' % (op, names[x] if isinstance(x, int) else x, y) for op, x, y in shape)
+                table = truth_table(program, n)
+                if table not in seen:
+                    seen.add(table)
+                    yield program
+
+
+class Springdroid:
+    """Springdroid booted to its instruction prompt; each program runs on a
+    fork of that state."""
+    _boot: Machine
+
+    def __init__(self, code: List[int], engine=CompiledMachine):
+        self._boot = engine(code)
+        AsciiChannel(self._boot).read()
+
+    def evaluate(self, program: Program, mode: Mode) -> Outcome:
+        """Runs program, stopping as soon as the first frame of a fall has
+        shown the hull."""
+        # Small buffers return control soon after the failure frame.
+        channel = AsciiChannel(self._boot.fork(), 64)
+        channel.write(text(program, mode))
+        seen = []
+        for chunk in channel.stream():
+            if isinstance(chunk, int):
+                return Outcome(chunk, None)
+            seen.append(chunk)
+            hull = _fallen_hull(''.join(seen))
+            if hull is not None:
+                return Outcome(None, hull)
+        raise Exception('Droid stopped without a result')
+
+
+def _fallen_hull(output: str) -> Optional[str]:
+    # The first frame after the failure message: three rows of air, then
+    # the hull with the droid at its start.
+    at = output.find(FAILED)
+    if at < 0:
+        return None
+    rows = output[at:].split('\n')
+    if len(rows) < 7:
+        return None
+    return rows[5]
+
+
+class HullOracle:
+    """Hulls the droid fell on, replayed against candidate truth tables.
+
+    A hull is kept as the sensor pattern at each position, or -1 over a
+    hole, so replaying the droid costs one table lookup per step. Sensors
+    past the end of a hull read ground.
+    """
+    sensors: int
+    hulls: List[List[int]]
+
+    def __init__(self, sensors: int):
+        self.sensors = sensors
+        self.hulls = []
+
+    @property
+    def patterns(self) -> Set[int]:
+        """Sensor patterns met on the recorded hulls."""
+        return {p for hull in self.hulls for p in hull if p >= 0}
+
+    def add(self, hull: str) -> None:
+        ground = [c == '#' for c in hull] + [True] * self.sensors
+        patterns = []
+        for x in range(len(hull)):
+            if not ground[x]:
+                patterns.append(-1)
+                continue
+            patterns.append(sum(1 << k for k in range(self.sensors) if ground[x + 1 + k]))
+        self.hulls.append(patterns)
+
+    def rejects(self, table: int) -> bool:
+        """Checks whether a droid jumping on table falls on a recorded hull."""
+        return not all(_crosses(hull, table) for hull in self.hulls)
+
+
+def _crosses(hull: List[int], table: int) -> bool:
+    x = 0
+    while x < len(hull):
+        p = hull[x]
+        if p < 0:
+            return False
+        x += 4 if table >> p & 1 else 1
+    return True
+
+
+def _evaluate(droid: Springdroid, job: Tuple[Program, Mode]) -> Outcome:
+    return droid.evaluate(*job)
+
+
+def synthesize(code: List[int], mode: Mode, processes: Optional[int] = None) -> Tuple[Program, int, int]:
+    """Returns the first candidate that gets the droid across, its hull
+    damage and the number of candidates run on the VM.
+
+    Candidates the oracle rejects are skipped. processes=1 runs one
+    candidate at a time in this process; otherwise rounds of candidates
+    are spread over a process pool, each worker with its own booted
+    droid, and the hulls of a round prune the next.
+    """
+    oracle = HullOracle(mode.sensors)
+    pending = candidates(mode)
+    droid = Springdroid(code) if processes == 1 else None
+    size = 1 if processes == 1 else 2 * (processes or os.cpu_count() or 1)
+    runs = 0
+    while True:
+        batch = []
+        for program in pending:
+            if not oracle.rejects(truth_table(program, mode.sensors)):
+                batch.append(program)
+                if len(batch) == size:
+                    break
+        if not batch:
+            raise Exception('No %s program found' % mode.command)
+        if droid is not None:
+            outcomes = [droid.evaluate(program, mode) for program in batch]
+        else:
+            outcomes = list(sweep(
+                _evaluate, code, [(program, mode) for program in batch], processes, chunksize=1, setup=Springdroid))
+        runs += len(batch)
+        for program, outcome in zip(batch, outcomes):
+            if outcome.damage is not None:
+                return program, outcome.damage, runs
+            oracle.add(outcome.hull)
+            if not oracle.rejects(truth_table(program, mode.sensors)):
+                raise Exception('Droid fell on %s, but %s crosses it' % (outcome.hull, program))
+
+
+def test_truth_table():
+    # Jump when A is a hole: true on every pattern with bit 0 clear.
+    assert truth_table(['NOT A J'], 2) == 0b0101
+    assert truth_table(['NOT A T', 'NOT B J', 'AND T J'], 2) == 0b0001
+    assert truth_table(['OR A J', 'AND B J', 'NOT J J'], 2) == 0b0111
+
+
+def test_candidates():
+    programs = list(candidates(WALK))
+    tables = [truth_table(p, 4) for p in programs]
+    assert len(set(tables)) == len(tables)
+    a, _, _, d = sensor_tables(4)
+    full = (1 << 16) - 1
+    for program, table in zip(programs, tables):
+        assert len(program) <= MAX_INSTRUCTIONS
+        assert table & ~d == 0
+        assert (full ^ a) & d & ~table == 0
+    # Jumping whenever D is ground needs no other sensor.
+    assert programs[0] == ('NOT J J', 'AND D J')
+    # With A and D ground, all functions of B and C but their exclusive or
+    # and its negation, which a single literal in T cannot build.
+    assert len(programs) == 14
+
+
+def test_hull_oracle():
+    oracle = HullOracle(4)
+    oracle.add('#####.#..########')
+    # Jumping only at the last moment clears the first hole but lands
+    # short of the next two.
+    assert oracle.rejects(truth_table(['NOT A J'], 4))
+    assert oracle.rejects(truth_table(['NOT A J', 'NOT B T', 'OR T J', 'AND D J'], 4))
+    assert not oracle.rejects(truth_table(['NOT A J', 'NOT C T', 'OR T J', 'AND D J'], 4))
+    assert oracle.hulls[0][:6] == [0b1111, 0b0111, 0b1011, 0b0101, 0b0010, -1]
+
+
+def test_fallen_hull():
+    output = "Running...\n\n\nDidn't make it across:\n\n.....\n.....\n@....\n##.##\n\n"
+    assert _fallen_hull(output) == '##.##'
+    assert _fallen_hull(output[:-6]) is None
@@ -1,170 +1,14 @@
 import collections
+import os
 import random
 import re
 import sys
 import typing
-from typing import Dict, Generator, Iterable, List, Optional, Tuple, Union
+from typing import Dict, List, Tuple
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
 
-class Memory:
-    _data: List[int]
-
-    def __init__(self, data: Iterable[int]):
-        self._data = list(data)
-
-    def copy(self) -> 'Memory':
-        return Memory(self._data)
-
-    def _ensure(self, i: int) -> None:
-        if i >= len(self._data):
-            self._data.extend(0 for _ in range(i - len(self._data) + 1))
-            assert i == len(self._data) - 1
-
-    def __getitem__(self, i: int) -> int:
-        self._ensure(i)
-        return self._data[i]
-
-    def __setitem__(self, i: int, v: int) -> None:
-        self._ensure(i)
-        self._data[i] = v
-
-
-class InputInterrupt(typing.NamedTuple):
-    pass
-
-
-class OutputInterrupt(typing.NamedTuple):
-    value: int
-
-
-Interrupt = Union[InputInterrupt, OutputInterrupt]
-
-
-class Machine:
-    _interpreter: Generator[Union[InputInterrupt, OutputInterrupt], int, None]
-
-    def __init__(self, code: List[int]):
-        self._interpreter = Machine._interpret(code)
-
-    def communicate(self, inputs: Iterable[int]) -> Iterable[int]:
-        input_iter = iter(inputs)
-        while True:
-            try:
-                interrupt = next(self._interpreter)
-            except StopIteration:
-                break
-            if isinstance(interrupt, InputInterrupt):
-                self._interpreter.send(next(input_iter))
-            elif isinstance(interrupt, OutputInterrupt):
-                yield interrupt.value
-            else:
-                raise Exception('Unknown interrupt %s' % type(interrupt))
-
-    def send(self, inputs: List[int]) -> None:
-        input_pos = 0
-        while input_pos < len(inputs):
-            try:
-                interrupt = next(self._interpreter)
-            except StopIteration:
-                raise Exception('Unexpected halt')
-            if isinstance(interrupt, InputInterrupt):
-                self._interpreter.send(inputs[input_pos])
-                input_pos += 1
-            elif isinstance(interrupt, OutputInterrupt):
-                raise Exception('Unexpected output')
-            else:
-                raise Exception('Unknown interrupt %s' % type(interrupt))
-
-    def receive(self, size: int) -> List[int]:
-        outputs = []
-        while len(outputs) < size:
-            try:
-                interrupt = next(self._interpreter)
-            except StopIteration:
-                raise Exception('Unexpected halt')
-            if isinstance(interrupt, InputInterrupt):
-                raise Exception('Unexpected input')
-            elif isinstance(interrupt, OutputInterrupt):
-                outputs.append(interrupt.value)
-            else:
-                raise Exception('Unknown interrupt %s' % type(interrupt))
-        return outputs
-
-    def wait_interrupt(self, next_input: int) -> Optional[Interrupt]:
-        try:
-            interrupt = next(self._interpreter)
-        except StopIteration:
-            return None
-        if isinstance(interrupt, InputInterrupt):
-            self._interpreter.send(next_input)
-        return interrupt
-
-    @staticmethod
-    def _interpret(code: Iterable[int]) -> Generator[Interrupt, int, None]:
-        mem = Memory(code)
-        pc = 0
-        rb = 0
-
-        while True:
-            op = mem[pc] % 100
-
-            def invalue(k):
-                arg = mem[pc + k]
-                mode = mem[pc] // 100 // (10 ** (k - 1)) % 10
-                if mode == 0:
-                    return mem[arg]
-                if mode == 1:
-                    return arg
-                if mode == 2:
-                    return mem[rb + arg]
-                raise Exception('Unknown arg mode %d' % mode)
-
-            def outaddr(k):
-                mode = mem[pc] // 100 // (10 ** (k - 1)) % 10
-                if mode == 0:
-                    return mem[pc + k]
-                if mode == 1:
-                    raise Exception('Immediate outaddr is invalid')
-                if mode == 2:
-                    return mem[pc + k] + rb
-                raise Exception('Unknown arg mode %d' % mode)
-
-            if op == 99:
-                break
-            elif op == 1:
-                mem[outaddr(3)] = invalue(1) + invalue(2)
-                pc += 4
-            elif op == 2:
-                mem[outaddr(3)] = invalue(1) * invalue(2)
-                pc += 4
-            elif op == 3:
-                mem[outaddr(1)] = yield InputInterrupt()
-                yield
-                pc += 2
-            elif op == 4:
-                yield OutputInterrupt(invalue(1))
-                pc += 2
-            elif op == 5:
-                if invalue(1) != 0:
-                    pc = invalue(2)
-                else:
-                    pc += 3
-            elif op == 6:
-                if invalue(1) == 0:
-                    pc = invalue(2)
-                else:
-                    pc += 3
-            elif op == 7:
-                mem[outaddr(3)] = 1 if invalue(1) < invalue(2) else 0
-                pc += 4
-            elif op == 8:
-                mem[outaddr(3)] = 1 if invalue(1) == invalue(2) else 0
-                pc += 4
-            elif op == 9:
-                rb += invalue(1)
-                pc += 2
-            else:
-                raise Exception('Unknown op %d' % op)
+from intcode import AsciiChannel, CompiledMachine, Machine, Snapshot
 
 
 class Room(typing.NamedTuple):
@@ -185,16 +29,6 @@ Doors here lead:
 )+)
 )?""")
 
-GOOD_ITEMS = (
-    'dehydrated water',
-    'ornament',
-    'sand',
-    'astrolabe',
-    'shell',
-    'klein bottle',
-    'semiconductor',
-    'mutex',
-)
 BAD_ITEMS = (
     'photons',
     'escape pod',
@@ -214,19 +48,19 @@ def opposite(dir: str) -> str:
 
 
 class Droid:
-    _code: List[int]
-    _mac: Machine
+    _boot: Snapshot
+    _channel: AsciiChannel
     _rooms: Dict[str, Room]
     _mapping: Dict[Tuple[str, str], str]
 
-    def __init__(self, code: List[int]):
-        self._code = code
-        self._mac = Machine(code)
+    def __init__(self, boot: Snapshot):
+        self._boot = boot
+        self._channel = AsciiChannel(CompiledMachine.from_snapshot(boot))
         self._rooms = {}
         self._mapping = {}
 
     def restart(self) -> 'Droid':
-        copy = Droid(self._code)
+        copy = Droid(self._boot)
         copy._rooms = self._rooms
         copy._mapping = self._mapping
         return copy
@@ -255,31 +89,73 @@ class Droid:
 
         print(self._mapping)
 
-    def take_and_try(self, takes: List[str]) -> None:
+    def fork(self) -> 'Droid':
+        """Returns a droid continuing from this one's current state."""
+        copy = Droid(self._channel.machine.snapshot())
+        copy._rooms = self._rooms
+        copy._mapping = self._mapping
+        return copy
+
+    def safe_items(self) -> List[str]:
+        return [item for room in self._rooms.values() for item in room.items if item not in BAD_ITEMS]
+
+    def collect(self, items: List[str]) -> None:
+        """Takes items on one tour, nearest first, and walks to the Security
+        Checkpoint."""
         room, = Droid._parse_rooms(self._command(''))
         current_name = room.name
-
-        for item in takes:
+        left = set(items)
+        while left:
+            routes = []
             for room in self._rooms.values():
-                if item in room.items:
-                    break
-            else:
-                assert False, '%s not found' % item
-            route = self._find_route(current_name, room.name)
+                for item in room.items:
+                    if item in left:
+                        routes.append((self._find_route(current_name, room.name), room.name, item))
+            route, current_name, item = min(routes, key=lambda r: len(r[0]))
             for dir in route:
                 self._command(dir)
-            current_name = room.name
             text = self._command('take %s' % item)
             assert 'You take' in text, text
-
-        route = self._find_route(current_name, 'Security Checkpoint')
-        for dir in route:
+            left.remove(item)
+        for dir in self._find_route(current_name, 'Security Checkpoint'):
             self._command(dir)
-        text = self._command('south')
-        if 'you are ejected' in text:
-            return
-        print(text)
-        sys.exit(0)
+
+    def pass_checkpoint(self, items: List[str]) -> str:
+        """Finds which of the held items the pressure-sensitive floor accepts
+        and returns what it says on entry.
+
+        Subsets are visited in Gray-code order, so consecutive ones differ by
+        one item, and the droid only takes or drops items when a subset is
+        actually tried. Being too heavy rules out every superset of what was
+        held, and being too light every subset, so those are passed over.
+        """
+        door, = [dir for (name, dir), next in self._mapping.items()
+                 if name == 'Security Checkpoint' and next == 'Pressure-Sensitive Floor']
+        full = (1 << len(items)) - 1
+        held = full
+        want = full
+        heavy: List[int] = []
+        light: List[int] = []
+        for i in range(1 << len(items)):
+            # Gray code: step i toggles the lowest set bit of i.
+            want ^= i & -i
+            if any(want & h == h for h in heavy) or any(want & ~l == 0 for l in light):
+                continue
+            for k, item in enumerate(items):
+                bit = 1 << k
+                if (held ^ want) & bit:
+                    text = self._command(('take %s' if want & bit else 'drop %s') % item)
+                    assert 'You ' in text, text
+            held = want
+            print('Trying %s' % ', '.join(item for k, item in enumerate(items) if held >> k & 1))
+            text = self._command(door)
+            if 'heavier than the detected' in text:
+                light.append(held)
+            elif 'lighter than the detected' in text:
+                heavy.append(held)
+            else:
+                return text
+        raise Exception('No combination of items passes the checkpoint')
 
     def _find_unexplored(self) -> Tuple[str, str]:
         for room in self._rooms.values():
@@ -311,20 +187,8 @@ class Droid:
         return list(reversed(reverse_route))
 
     def _command(self, cmd: str) -> str:
-        inputs = [ord(c) for c in (cmd + '\n\n')]
-        input_pos = 0
-        outputs = []
-        while input_pos < len(inputs):
-            intr = self._mac.wait_interrupt(inputs[input_pos])
-            if intr is None:
-                break
-            if isinstance(intr, InputInterrupt):
-                input_pos += 1
-            elif isinstance(intr, OutputInterrupt):
-                outputs.append(intr.value)
-            else:
-                assert False, intr
-        text = ''.join(chr(c) for c in outputs)
+        self._channel.write(cmd + '\n')
+        text = self._channel.read()
         #sys.stdout.write(text)
         return text
 
@@ -355,29 +219,17 @@ Command?
 """)
 
 
-T = typing.TypeVar('T')
-
-
-def combination(v: List[T]) -> Iterable[List[T]]:
-    if not v:
-        yield []
-        return
-    for u in combination(v[:-1]):
-        yield u
-        yield u + [v[-1]]
-
-
 def main():
     with open('input.txt') as f:
         code = [int(s) for s in f.read().strip().split(',')]
 
-    droid = Droid(code)
+    droid = Droid(Machine(code).snapshot())
     droid.init_explore()
 
-    for takes in combination(GOOD_ITEMS):
-        print('Trying %s' % ', '.join(takes))
-        droid = droid.restart()
-        droid.take_and_try(takes)
+    items = droid.safe_items()
+    droid = droid.restart()
+    droid.collect(items)
+    print(droid.fork().pass_checkpoint(items))
 
 
 if __name__ == '__main__':
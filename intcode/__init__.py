@@ -0,0 +1,22 @@
+from intcode.ascii import AsciiChannel
+from intcode.jit import CompiledMachine
+from intcode.machine import (
+    IO,
+    BufferFull,
+    InputInterrupt,
+    Instruction,
+    Interrupt,
+    LimitReached,
+    Machine,
+    OutputInterrupt,
+    Snapshot,
+    StaticIO,
+    Superinstruction,
+    decode,
+    load_code,
+    optimize,
+    parse_code,
+    run,
+)
+from intcode.memory import Memory, PagedMemory
+from intcode.ring import RingBuffer
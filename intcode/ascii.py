@@ -0,0 +1,111 @@
+from typing import Iterator, List, Union
+
+from intcode.machine import BufferFull, InputInterrupt, Machine
+from intcode.ring import RingBuffer
+
+Chunk = Union[str, int]
+
+
+class AsciiChannel:
+    """Text I/O for ASCII-speaking Intcode programs.
+
+    Output values 0-255 are characters; anything else is an out-of-band
+    integer, such as the final answer of day17 and day21. Text is converted
+    a whole buffer at a time through bytes rather than per character.
+    """
+    _mac: Machine
+    _inbox: RingBuffer
+    _outbox: RingBuffer
+    # Input not yet accepted by the full inbox.
+    _backlog: bytes
+    # Out-of-band values dropped by read().
+    values: List[int]
+
+    def __init__(self, mac: Machine, capacity: int = 4096):
+        self._mac = mac
+        self._inbox = RingBuffer(capacity)
+        self._outbox = RingBuffer(capacity)
+        self._backlog = b''
+        self.values = []
+
+    @property
+    def machine(self) -> Machine:
+        return self._mac
+
+    def write(self, text: Union[str, bytes]) -> None:
+        """Queues input; nothing runs until output is read."""
+        if isinstance(text, str):
+            text = text.encode('ascii')
+        self._backlog += text
+        self._refill()
+
+    def stream(self) -> Iterator[Chunk]:
+        """Runs the machine, yielding text chunks and out-of-band values.
+
+        Stops when the machine halts or has consumed all written input.
+        """
+        while True:
+            interrupt = self._mac.pump(self._inbox, self._outbox)
+            yield from self._drain()
+            if isinstance(interrupt, BufferFull):
+                continue
+            if isinstance(interrupt, InputInterrupt) and self._backlog:
+                self._refill()
+                continue
+            return
+
+    def read(self) -> str:
+        """Like stream(), returning the text and keeping values aside."""
+        text = []
+        for chunk in self.stream():
+            if isinstance(chunk, str):
+                text.append(chunk)
+            else:
+                self.values.append(chunk)
+        return ''.join(text)
+
+    def _refill(self) -> None:
+        n = self._inbox.write(self._backlog)
+        self._backlog = self._backlog[n:]
+
+    def _drain(self) -> Iterator[Chunk]:
+        values = self._outbox.read()
+        if not values:
+            return
+        try:
+            yield bytes(values).decode('latin-1')
+            return
+        except ValueError:
+            pass
+        start = 0
+        for i, value in enumerate(values):
+            if not 0 <= value < 256:
+                if start < i:
+                    yield bytes(values[start:i]).decode('latin-1')
+                yield value
+                start = i + 1
+        if start < len(values):
+            yield bytes(values[start:]).decode('latin-1')
+
+
+def test_ascii_channel():
+    # Echoes every input character; on '\n' also outputs 1000 + the line
+    # length.
+    code = [
+        3, 100,                  # 0: in c
+        4, 100,                  # 2: out c
+        1001, 101, 1, 101,       # 4: n += 1
+        1008, 100, 10, 102,      # 8: [102] = c == '\n'
+        1006, 102, 0,            # 12: loop unless newline
+        1001, 101, 999, 103,     # 15: [103] = n + 999
+        4, 103,                  # 19: out [103]
+        1101, 0, 0, 101,         # 21: n = 0
+        1105, 1, 0,              # 25: loop
+    ]
+    channel = AsciiChannel(Machine(code), capacity=4)
+    channel.write('hello\nab')
+    assert list(channel.stream()) == ['hell', 'o\n', 1005, 'a', 'b']
+    channel.write(b'c\n')
+    assert channel.read() == 'c\n'
+    assert channel.values == [1003]
+    assert not channel.machine.halted
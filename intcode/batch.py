@@ -0,0 +1,269 @@
+"""Lockstep execution of many copies of one Intcode program with NumPy.
+
+Every lane has its own memory row, pc, relative base and input cursor. Each
+step executes one instruction on every running lane; lanes that diverge
+onto different opcodes are handled by masking per opcode. Values are int64;
+a lane whose addition, multiplication or relative base adjustment would
+overflow is finished on the scalar Machine from the state before that
+instruction, so results match its arbitrary-precision ints.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+from intcode.machine import InputInterrupt, Machine, Snapshot
+from intcode.memory import Memory
+
+_SIZES = {1: 4, 2: 4, 3: 2, 4: 2, 5: 3, 6: 3, 7: 4, 8: 4, 9: 2, 99: 1}
+_INT64_MIN = np.iinfo(np.int64).min
+
+
+def _wrapped(op: int, a: np.ndarray, b: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Lanes where values, computed as a + b (op 1) or a * b (op 2) in
+    int64, wrapped around."""
+    if op == 2:
+        # An exact product divides back exactly; a wrapped one is off by a
+        # multiple of 2**64, more than any divisor.
+        with np.errstate(all='ignore'):
+            quotient = values // np.where(a == 0, 1, a)
+        return (a != 0) & ((quotient != b) | ((a == -1) & (b == _INT64_MIN)))
+    return ((a ^ values) & (b ^ values)) < 0
+
+
+class BatchMachine:
+    _mem: np.ndarray
+    _pc: np.ndarray
+    _rb: np.ndarray
+    _running: np.ndarray
+    _halted: np.ndarray
+    _inputs: np.ndarray
+    _input_pos: np.ndarray
+    outputs: List[List[int]]
+    instructions: np.ndarray
+
+    def __init__(self, code: Sequence[int], inputs_matrix: Sequence[Sequence[int]]):
+        inputs = np.asarray(inputs_matrix, dtype=np.int64)
+        if inputs.ndim != 2:
+            raise Exception('Inputs must be a 2-D matrix')
+        n = inputs.shape[0]
+        size = max(len(code) * 2, 64)
+        self._mem = np.zeros((n, size), dtype=np.int64)
+        self._mem[:, :len(code)] = np.asarray(code, dtype=np.int64)
+        self._pc = np.zeros(n, dtype=np.int64)
+        self._rb = np.zeros(n, dtype=np.int64)
+        self._running = np.ones(n, dtype=bool)
+        self._halted = np.zeros(n, dtype=bool)
+        self._inputs = inputs
+        self._input_pos = np.zeros(n, dtype=np.int64)
+        self.outputs = [[] for _ in range(n)]
+        self.instructions = np.zeros(n, dtype=np.int64)
+
+    @property
+    def halted(self) -> np.ndarray:
+        return self._halted
+
+    def run(self) -> List[List[int]]:
+        """Runs until every lane halts or runs out of inputs."""
+        while True:
+            lanes = np.nonzero(self._running)[0]
+            if len(lanes) == 0:
+                return self.outputs
+            self._step(lanes)
+
+    def _ensure(self, size: int) -> None:
+        if size > self._mem.shape[1]:
+            grown = max(size, self._mem.shape[1] * 2)
+            self._mem = np.pad(self._mem, ((0, 0), (0, grown - self._mem.shape[1])))
+
+    def _param(self, lanes: np.ndarray, pc: np.ndarray, k: int) -> np.ndarray:
+        return self._mem[lanes, pc + k]
+
+    def _invalue(self, lanes: np.ndarray, pc: np.ndarray, k: int, mode: np.ndarray) -> np.ndarray:
+        arg = self._param(lanes, pc, k)
+        addr = np.where(mode == 2, self._rb[lanes] + arg, arg)
+        indirect = mode != 1
+        if np.any(indirect & (addr < 0)):
+            raise Exception('Negative address')
+        inside = addr < self._mem.shape[1]
+        values = self._mem[lanes, np.where(inside, addr, 0)]
+        return np.where(indirect, np.where(inside, values, 0), arg)
+
+    def _outaddr(self, lanes: np.ndarray, pc: np.ndarray, k: int, mode: np.ndarray) -> np.ndarray:
+        if np.any(mode == 1):
+            raise Exception('Immediate outaddr is invalid')
+        arg = self._param(lanes, pc, k)
+        addr = np.where(mode == 2, self._rb[lanes] + arg, arg)
+        if np.any(addr < 0):
+            raise Exception('Negative address')
+        return addr
+
+    def _store(self, lanes: np.ndarray, addr: np.ndarray, values: np.ndarray) -> None:
+        self._ensure(int(addr.max()) + 1)
+        self._mem[lanes, addr] = values
+
+    def _fall_back(self, lanes: np.ndarray, wrapped: np.ndarray) -> np.ndarray:
+        """Finishes the wrapped lanes on the scalar Machine, from their
+        current instruction, and returns the mask of the others.
+
+        The current instruction has already been counted.
+        """
+        for lane in lanes[wrapped].tolist():
+            snapshot = Snapshot(
+                Memory(self._mem[lane].tolist()), int(self._pc[lane]), int(self._rb[lane]),
+                False, int(self.instructions[lane]) - 1)
+            mac = Machine.from_snapshot(snapshot)
+            pos = int(self._input_pos[lane])
+            while True:
+                interrupt = mac.next_interrupt()
+                if interrupt is None:
+                    break
+                if isinstance(interrupt, InputInterrupt):
+                    if pos == self._inputs.shape[1]:
+                        break
+                    mac.feed(int(self._inputs[lane, pos]))
+                    pos += 1
+                else:
+                    self.outputs[lane].append(interrupt.value)
+            self._halted[lane] = mac.halted
+            self._running[lane] = False
+            self._input_pos[lane] = pos
+            self.instructions[lane] = mac.instructions
+        return ~wrapped
+
+    def _step(self, lanes: np.ndarray) -> None:
+        pc = self._pc[lanes]
+        self._ensure(int(pc.max()) + 4)
+        raw = self._mem[lanes, pc]
+        ops = raw % 100
+        modes = raw // 100
+
+        for op in np.unique(ops).tolist():
+            if op not in _SIZES:
+                raise Exception('Unknown op %d' % op)
+            mask = ops == op
+            sel = lanes[mask]
+            spc = pc[mask]
+            smodes = modes[mask]
+            m1, m2, m3 = smodes % 10, smodes // 10 % 10, smodes // 100 % 10
+            for mode in (m1, m2, m3)[:_SIZES[op] - 1]:
+                bad = mode[mode > 2]
+                if len(bad):
+                    raise Exception('Unknown arg mode %d' % bad[0])
+            if op == 99:
+                self._halted[sel] = True
+                self._running[sel] = False
+                self.instructions[sel] += 1
+                continue
+            if op == 3:
+                has_input = self._input_pos[sel] < self._inputs.shape[1]
+                self._running[sel[~has_input]] = False
+                sel, spc, m1 = sel[has_input], spc[has_input], m1[has_input]
+                if len(sel) == 0:
+                    continue
+                values = self._inputs[sel, self._input_pos[sel]]
+                self._store(sel, self._outaddr(sel, spc, 1, m1), values)
+                self._input_pos[sel] += 1
+                self._pc[sel] = spc + 2
+                self.instructions[sel] += 1
+                continue
+            self.instructions[sel] += 1
+            if op == 4:
+                values = self._invalue(sel, spc, 1, m1)
+                for lane, value in zip(sel.tolist(), values.tolist()):
+                    self.outputs[lane].append(value)
+                self._pc[sel] = spc + 2
+            elif op == 5 or op == 6:
+                cond = self._invalue(sel, spc, 1, m1)
+                target = self._invalue(sel, spc, 2, m2)
+                jump = cond != 0 if op == 5 else cond == 0
+                self._pc[sel] = np.where(jump, target, spc + 3)
+            elif op == 9:
+                rb = self._rb[sel]
+                offset = self._invalue(sel, spc, 1, m1)
+                values = rb + offset
+                keep = self._fall_back(sel, _wrapped(1, rb, offset, values))
+                self._rb[sel[keep]] = values[keep]
+                self._pc[sel[keep]] = spc[keep] + 2
+            else:
+                a = self._invalue(sel, spc, 1, m1)
+                b = self._invalue(sel, spc, 2, m2)
+                if op == 1 or op == 2:
+                    values = a + b if op == 1 else a * b
+                    keep = self._fall_back(sel, _wrapped(op, a, b, values))
+                    sel, spc, m3, values = sel[keep], spc[keep], m3[keep], values[keep]
+                elif op == 7:
+                    values = (a < b).astype(np.int64)
+                else:
+                    values = (a == b).astype(np.int64)
+                if len(sel):
+                    self._store(sel, self._outaddr(sel, spc, 3, m3), values)
+                    self._pc[sel] = spc + 4
+
+
+def run_batch(code: Sequence[int], inputs_matrix: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Runs one copy of code per row of inputs_matrix and returns their outputs."""
+    return BatchMachine(code, inputs_matrix).run()
+
+
+def test_run_batch():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    assert run_batch(code, [[8], [7], [8]]) == [[1], [0], [1]]
+
+
+def test_divergence():
+    # Outputs 999 below 8, 1000 at 8 and 1001 above, taking different paths.
+    code = [int(s) for s in (
+        '3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,1106,0,36,98,0,0,'
+        '1002,21,125,20,4,20,1105,1,46,104,999,1105,1,46,1101,1000,1,20,4,20,'
+        '1105,1,46,98,99').split(',')]
+    assert run_batch(code, [[7], [8], [9]]) == [[999], [1000], [1001]]
+
+
+def test_relative_and_growth():
+    code = [int(s) for s in '109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99'.split(',')]
+    mac = BatchMachine(code, [[]] * 2)
+    assert mac.run() == [code, code]
+    assert mac.halted.all()
+
+
+def test_out_of_inputs():
+    mac = BatchMachine([3, 7, 4, 7, 1105, 1, 0, 0], [[1, 2], [3, 4]])
+    assert mac.run() == [[1, 2], [3, 4]]
+    assert not mac.halted.any()
+
+
+def test_invalid_mode():
+    # Mode 3 on the output's only parameter; decode rejects it too.
+    try:
+        run_batch([304, 0, 99], [[]])
+    except Exception:
+        pass
+    else:
+        assert False, 'Mode 3 accepted'
+
+
+def test_overflow():
+    # Squares its input twice, printing both squares.
+    code = [3, 15, 2, 15, 15, 15, 4, 15, 2, 15, 15, 15, 4, 15, 99, 0]
+    inputs = [[3], [1 << 20], [1 << 40], [-(1 << 32)]]
+    expected = [list(Machine(code).communicate(row)) for row in inputs]
+    assert expected[2] == [1 << 80, 1 << 160]
+    mac = BatchMachine(code, inputs)
+    assert mac.run() == expected
+    assert mac.halted.all()
+    assert mac.instructions.tolist() == [6] * 4
+    # Relative base adjustments fall back too.
+    mac = BatchMachine([109, 1 << 62, 109, 1 << 62, 99], [[]])
+    mac.run()
+    assert mac.halted.all() and mac.instructions.tolist() == [3]
+
+
+def test_wrapped():
+    big = 1 << 62
+    a = np.array([big, -big, big])
+    b = np.array([big, -big - 1, -big])
+    assert _wrapped(1, a, b, a + b).tolist() == [True, True, False]
+    a = np.array([-1, -1, 0, 3, -4])
+    b = np.array([-big, _INT64_MIN, _INT64_MIN, big, big // 2])
+    assert _wrapped(2, a, b, a * b).tolist() == [False, True, False, True, False]
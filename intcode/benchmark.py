@@ -0,0 +1,226 @@
+"""Intcode throughput benchmark.
+
+Runs every day's input.txt program through the Machine API with fixed
+inputs, stopping at halt or when a program asks for more input than its
+case provides, and reports instructions executed, wall time, peak memory and
+instructions per second for each engine.
+
+    python -m intcode.benchmark [--engine NAME]... [--case NAME]...
+                                [--json PATH] [--baseline PATH]
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import typing
+from typing import Callable, Dict, List, Optional
+
+from intcode.jit import CompiledMachine
+from intcode.machine import InputInterrupt, Machine, load_code
+from intcode.reference import ReferenceMachine
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+ENGINES: Dict[str, Callable[[List[int]], Machine]] = {
+    'reference': ReferenceMachine,
+    'fast': Machine,
+    'paged': functools.partial(Machine, paged=True),
+    'compiled': CompiledMachine,
+}
+
+
+def _ascii(text: str) -> List[int]:
+    return [ord(c) for c in text]
+
+
+def _read(path: str) -> str:
+    with open(os.path.join(_ROOT, path)) as f:
+        return f.read()
+
+
+class Case(typing.NamedTuple):
+    name: str
+    day: str
+    inputs: List[int]
+    patches: Dict[int, int] = {}
+    repeat: int = 1
+
+
+def cases() -> List[Case]:
+    commands = ''.join('%s\n' % c for c in ['inv', 'north', 'south', 'east', 'west'] * 40)
+    return [
+        Case('day05-diagnostic', 'day05', [5], repeat=200),
+        Case('day07-amplifier', 'day07', [4, 0], repeat=200),
+        Case('day09-boost', 'day09', [2]),
+        Case('day11-painter', 'day11', [0] * 20000),
+        Case('day13-arcade', 'day13', [-1, 0, 1, 1, 0, -1] * 2000, patches={0: 2}, repeat=10),
+        Case('day15-droid', 'day15', [1, 4, 2, 3] * 2500),
+        Case('day17-camera', 'day17', [], repeat=5),
+        Case('day19-beam', 'day19', [20, 20], repeat=500),
+        Case('day21-springdroid', 'day21', _ascii(_read('day21/day21b.txt'))),
+        Case('day23-nic', 'day23', [0] + [-1] * 2000, repeat=10),
+        Case('day25-adventure', 'day25', _ascii(commands)),
+    ]
+
+
+class Result(typing.NamedTuple):
+    engine: str
+    case: str
+    instructions: int
+    outputs: int
+    output_digest: str
+    wall_time: float
+    peak_memory: int
+    instructions_per_second: float
+
+
+def _load(case: Case) -> List[int]:
+    code = load_code(os.path.join(_ROOT, case.day, 'input.txt'))
+    for addr, value in case.patches.items():
+        code[addr] = value
+    return code
+
+
+def _drive(mac: Machine, inputs: List[int]) -> List[int]:
+    """Runs mac until it halts or asks for input past the end of inputs."""
+    outputs = []
+    pos = 0
+    while True:
+        interrupt = mac.next_interrupt()
+        if interrupt is None:
+            return outputs
+        if isinstance(interrupt, InputInterrupt):
+            if pos == len(inputs):
+                return outputs
+            mac.feed(inputs[pos])
+            pos += 1
+        else:
+            outputs.append(interrupt.value)
+
+
+def run_case(engine_name: str, case: Case) -> Result:
+    engine = ENGINES[engine_name]
+    code = _load(case)
+
+    instructions = 0
+    outputs = []
+    start = time.perf_counter()
+    for _ in range(case.repeat):
+        mac = engine(code)
+        outputs = _drive(mac, case.inputs)
+        instructions += mac.instructions
+    wall_time = time.perf_counter() - start
+
+    # Memory is measured on a separate run since tracing skews timing.
+    tracemalloc.start()
+    try:
+        mac = engine(code)
+        _drive(mac, case.inputs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    digest = hashlib.sha1(','.join(str(v) for v in outputs).encode()).hexdigest()
+    return Result(
+        engine=engine_name,
+        case=case.name,
+        instructions=instructions,
+        outputs=len(outputs),
+        output_digest=digest,
+        wall_time=wall_time,
+        peak_memory=peak_memory,
+        instructions_per_second=instructions / wall_time if wall_time > 0 else 0.0)
+
+
+def run_all(engine_names: List[str], case_names: Optional[List[str]] = None) -> List[Result]:
+    results = []
+    for case in cases():
+        if case_names and case.name not in case_names:
+            continue
+        for engine_name in engine_names:
+            results.append(run_case(engine_name, case))
+    return results
+
+
+def dump(results: List[Result], path: str) -> None:
+    report = {
+        'timestamp': time.time(),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'results': [r._asdict() for r in results],
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load(path: str) -> List[Result]:
+    with open(path) as f:
+        report = json.load(f)
+    return [Result(**r) for r in report['results']]
+
+
+def print_results(results: List[Result], baseline: Optional[List[Result]] = None) -> None:
+    base = {(r.engine, r.case): r for r in (baseline or [])}
+    print('%-12s %-20s %12s %9s %10s %14s %8s' % (
+        'engine', 'case', 'instructions', 'time(s)', 'peak(KB)', 'instructions/s', 'vs base'))
+    for r in results:
+        ratio = ''
+        b = base.get((r.engine, r.case))
+        if b and b.instructions_per_second > 0:
+            ratio = '%.2fx' % (r.instructions_per_second / b.instructions_per_second)
+            if b.output_digest != r.output_digest:
+                ratio += ' (output differs)'
+        print('%-12s %-20s %12d %9.3f %10.1f %14.0f %8s' % (
+            r.engine, r.case, r.instructions, r.wall_time, r.peak_memory / 1024,
+            r.instructions_per_second, ratio))
+
+    by_case: Dict[str, List[Result]] = {}
+    for r in results:
+        by_case.setdefault(r.case, []).append(r)
+    for case_name, rs in by_case.items():
+        if len({r.output_digest for r in rs}) > 1:
+            print('WARNING: engines disagree on %s outputs' % case_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Intcode throughput benchmark')
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help='engine to run (repeatable; default: all)')
+    parser.add_argument('--case', action='append',
+                        choices=[c.name for c in cases()],
+                        help='case to run (repeatable; default: all)')
+    parser.add_argument('--json', help='save results as JSON to this path')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    args = parser.parse_args()
+
+    results = run_all(args.engine or list(ENGINES), args.case)
+    baseline = load(args.baseline) if args.baseline else None
+    print_results(results, baseline)
+    if args.json:
+        dump(results, args.json)
+
+
+def test_run_case():
+    case, = [c for c in cases() if c.name == 'day05-diagnostic']
+    case = case._replace(repeat=1)
+    results = [run_case(name, case) for name in ENGINES]
+    assert len({r.instructions for r in results}) == 1
+    assert len({r.output_digest for r in results}) == 1
+    assert all(r.outputs == 1 for r in results)
+
+
+def test_drive():
+    # Echoes forever; the case's inputs are its budget.
+    mac = Machine([3, 7, 4, 7, 1105, 1, 0, 0])
+    assert _drive(mac, [1, 2]) == [1, 2]
+    assert not mac.halted
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+import typing
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from intcode.machine import (
+    _FULL, _INPUT, _LIMIT, BufferFull, Interrupt, LimitReached, Machine, OutputInterrupt, Snapshot, decode)
+from intcode.memory import Memory
+from intcode.ring import RingBuffer
+
+# A compiled block takes (data, rb, code) and returns (pc, rb, executed,
+# status). status is _NORMAL, _FAULT when an instruction hit an address out
+# of range (pc is left on it), the address of a compiled instruction the
+# block has just overwritten, or an OutputInterrupt for a block ending in
+# an output instruction.
+BlockFn = Callable[[List[int], int, Dict[int, List[int]]], Tuple[int, int, int, Any]]
+
+_NORMAL = -1
+_FAULT = -2
+
+MAX_BLOCK_SIZE = 64
+MAX_CACHED_VARIANTS = 8
+
+_EXPRS = {
+    1: '%s + %s',
+    2: '%s * %s',
+    7: '1 if %s < %s else 0',
+    8: '1 if %s == %s else 0',
+}
+
+
+class Translation(typing.NamedTuple):
+    end: int
+    source: str
+    # Addresses whose values are baked into source.
+    addrs: List[int]
+    # Whether the block stores to memory.
+    writes: bool
+
+
+class _Compiled(typing.NamedTuple):
+    fn: BlockFn
+    addrs: List[int]
+    values: Tuple[int, ...]
+    writes: bool
+
+
+# Compiled blocks by start address, shared by all machines. An entry is
+# reusable wherever memory holds the same values at its baked addresses.
+_compiled: Dict[int, List[_Compiled]] = {}
+
+
+def _param(data: List[int], addr: int, dynamic: Set[int]) -> str:
+    if addr in dynamic:
+        return 'data[%d]' % addr
+    return '%d' % data[addr]
+
+
+def _invalue(mode: int, param: str) -> str:
+    if mode == 0:
+        return 'data[%s]' % param
+    if mode == 1:
+        return param
+    return 'data[rb + %s]' % param
+
+
+def translate(data: List[int], start: int, dynamic: Set[int] = frozenset()) -> Optional[Translation]:
+    """Translates the basic block at start into the source of a function.
+
+    Straight-line arithmetic, relative base adjustments and conditional jumps
+    are translated with parameter modes resolved and parameters inlined,
+    except for parameters at addresses in dynamic, which are read at run
+    time. The block ends after an output or an unconditional jump, before
+    input, halt or an undecodable instruction, or after MAX_BLOCK_SIZE
+    instructions.
+
+    Returns the source of a function named block, or None if nothing at start
+    can be compiled.
+    """
+    body = []
+    pcs = []
+    addrs = []
+    pc = start
+    terminated = False
+    writes = False
+    while not terminated and len(pcs) < MAX_BLOCK_SIZE and pc < len(data):
+        try:
+            ins = decode(data[pc])
+        except Exception:
+            break
+        op = ins.op
+        if op == 3 or op == 99 or pc + ins.size > len(data):
+            break
+        args = [_param(data, pc + k, dynamic) for k in range(1, ins.size)]
+        addrs.append(pc)
+        addrs.extend(a for a in range(pc + 1, pc + ins.size) if a not in dynamic)
+        k = len(pcs)
+        pcs.append(pc)
+        next_pc = pc + ins.size
+        body.append('i = %d' % k)
+        if op == 4:
+            body.append('return %d, rb, %d, OutputInterrupt(%s)' % (
+                next_pc, k + 1, _invalue(ins.mode1, args[0])))
+            terminated = True
+        elif op == 9:
+            body.append('rb += %s' % _invalue(ins.mode1, args[0]))
+        elif op == 5 or op == 6:
+            target = _invalue(ins.mode2, args[1])
+            if ins.mode1 == 1 and pc + 1 not in dynamic:
+                if (data[pc + 1] != 0) == (op == 5):
+                    body.append('return %s, rb, %d, %d' % (target, k + 1, _NORMAL))
+                    terminated = True
+            else:
+                cond = _invalue(ins.mode1, args[0])
+                body.append(('if %s:' if op == 5 else 'if not %s:') % cond)
+                body.append('    return %s, rb, %d, %d' % (target, k + 1, _NORMAL))
+        else:
+            expr = _EXPRS[op] % (_invalue(ins.mode1, args[0]), _invalue(ins.mode2, args[1]))
+            if ins.mode3 == 2:
+                body.append('t = rb + %s' % args[2])
+                addr = 't'
+            elif pc + 3 in dynamic:
+                body.append('t = %s' % args[2])
+                addr = 't'
+            else:
+                addr = args[2]
+            body.append('data[%s] = %s' % (addr, expr))
+            writes = True
+            body.append('if %s in code:' % addr)
+            body.append('    return %d, rb, %d, %s' % (next_pc, k + 1, addr))
+        pc = next_pc
+    if not pcs:
+        return None
+    if not terminated:
+        body.append('return %d, rb, %d, %d' % (pc, len(pcs), _NORMAL))
+    lines = ['def block(data, rb, code):', '    try:']
+    lines.extend('        ' + line for line in body)
+    lines.append('    except IndexError:')
+    lines.append('        return %r[i], rb, i, %d' % (tuple(pcs), _FAULT))
+    return Translation(pc, '\n'.join(lines) + '\n', addrs, writes)
+
+
+def _lookup(data: List[int], start: int) -> Optional[_Compiled]:
+    for compiled in _compiled.get(start, ()):
+        try:
+            if tuple([data[a] for a in compiled.addrs]) == compiled.values:
+                return compiled
+        except IndexError:
+            pass
+    return None
+
+
+def _build(data: List[int], start: int, dynamic: Set[int]) -> Optional[_Compiled]:
+    translation = translate(data, start, dynamic)
+    if translation is None:
+        return None
+    namespace = {'OutputInterrupt': OutputInterrupt}
+    exec(compile(translation.source, '<intcode block %d>' % start, 'exec'), namespace)
+    compiled = _Compiled(
+        namespace['block'], translation.addrs, tuple(data[a] for a in translation.addrs), translation.writes)
+    variants = _compiled.setdefault(start, [])
+    variants.insert(0, compiled)
+    del variants[MAX_CACHED_VARIANTS:]
+    return compiled
+
+
+class CompiledMachine(Machine):
+    """Intcode machine translating basic blocks into Python functions.
+
+    Blocks are compiled lazily the first time their start address is
+    reached. Every write to a value baked into a compiled block invalidates
+    that block, so self-modifying programs behave exactly as on the
+    interpreter. Parameters that have been overwritten once are read from
+    memory when the block is recompiled, since Intcode programs patch them
+    to do indirect addressing. Paged memory falls back to the interpreter.
+    """
+    # None marks a start address left to the interpreter.
+    _blocks: Dict[int, Optional[BlockFn]]
+    _addrs: Dict[int, List[int]]
+    _code: Dict[int, List[int]]
+    _dynamic: Set[int]
+    # Start addresses of blocks that store to memory.
+    _writers: Set[int]
+
+    def __init__(self, code: Iterable[int], paged: bool = False):
+        super().__init__(code, paged)
+        self._blocks = {}
+        self._addrs = {}
+        self._code = {}
+        self._dynamic = set()
+        self._writers = set()
+
+    def restore(self, snapshot: Snapshot) -> None:
+        super().restore(snapshot)
+        self._blocks = {}
+        self._addrs = {}
+        self._code = {}
+        self._writers = set()
+
+    def _execute(self, limit: Optional[int] = None) -> Union[Interrupt, BufferFull, LimitReached, None]:
+        if self._halted:
+            return None
+        if self.profiler is not None or type(self._mem) is not Memory:
+            return super()._execute(limit)
+        # Shared memory is only copied before a block that stores runs.
+        data = self._mem._data
+        shared = self._mem._shared
+        writers = self._writers
+        blocks = self._blocks
+        code = self._code
+        # Recorded input goes through Machine.pump, outside this loop.
+        inbox = self._inbox if self.recorder is None else None
+        outbox = self._outbox
+        pc = self._pc
+        rb = self._rb
+        while True:
+            if limit is not None and limit - self.instructions < MAX_BLOCK_SIZE:
+                # A block could run past the limit, so step up to it.
+                if self.instructions >= limit:
+                    self._pc = pc
+                    self._rb = rb
+                    return _LIMIT
+                block = None
+            else:
+                block = blocks.get(pc)
+                if block is None and pc not in blocks:
+                    block = self._compile(data, pc)
+            if block is not None:
+                if shared and pc in writers:
+                    data = self._mem._own()
+                    shared = False
+                pc, rb, count, status = block(data, rb, code)
+                self.instructions += count
+                if status == _NORMAL:
+                    continue
+                if type(status) is OutputInterrupt:
+                    self._pc = pc
+                    self._rb = rb
+                    if outbox is None:
+                        return status
+                    outbox.push(status.value)
+                    if outbox.full():
+                        return _FULL
+                    continue
+                if status != _FAULT:
+                    self._invalidate(status)
+                    continue
+            # I/O, halt, invalid instructions, out-of-range accesses and
+            # steps near the limit.
+            self._pc = pc
+            self._rb = rb
+            interrupt = self._step()
+            if interrupt is _INPUT and inbox:
+                self._feed(inbox.pop())
+            elif interrupt is not None or self._halted:
+                return interrupt
+            data = self._mem._data
+            shared = self._mem._shared
+            pc = self._pc
+            rb = self._rb
+
+    def _store(self, addr: int, value: int) -> None:
+        super()._store(addr, value)
+        if addr in self._code:
+            self._invalidate(addr)
+
+    def _compile(self, data: List[int], start: int) -> Optional[BlockFn]:
+        compiled = _lookup(data, start) or _build(data, start, self._dynamic)
+        if compiled is None:
+            fn, addrs = None, [start]
+        else:
+            fn, addrs = compiled.fn, compiled.addrs
+        self._blocks[start] = fn
+        self._addrs[start] = addrs
+        if compiled is not None and compiled.writes:
+            self._writers.add(start)
+        for addr in addrs:
+            self._code.setdefault(addr, []).append(start)
+        return fn
+
+    def _invalidate(self, addr: int) -> None:
+        self._dynamic.add(addr)
+        for start in self._code.pop(addr, ()):
+            del self._blocks[start]
+            self._writers.discard(start)
+            for a in self._addrs.pop(start):
+                starts = self._code.get(a)
+                if starts is None:
+                    continue
+                starts.remove(start)
+                if not starts:
+                    del self._code[a]
+
+
+def _both(code: List[int], inputs: List[int]) -> Tuple[List[int], int]:
+    mac = CompiledMachine(code)
+    outputs = list(mac.communicate(inputs))
+    ref = Machine(code)
+    assert list(ref.communicate(inputs)) == outputs
+    assert ref.instructions == mac.instructions
+    return outputs, mac.instructions
+
+
+def test_translate():
+    code = [1001, 10, 5, 10, 1005, 10, 0, 99]
+    translation = translate(code, 0)
+    assert translation.end == 7
+    assert translation.addrs == list(range(7))
+    assert 'data[10] = data[10] + 5' in translation.source
+    translation = translate(code, 0, {2})
+    assert 'data[10] = data[10] + data[2]' in translation.source
+    assert 2 not in translation.addrs
+    assert translate([99], 0) is None
+
+
+def test_run():
+    code = [int(s) for s in '109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99'.split(',')]
+    assert _both(code, [])[0] == code
+    code = [int(s) for s in '3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9'.split(',')]
+    assert _both(code, [0])[0] == [0]
+    assert _both(code, [5])[0] == [1]
+
+
+def test_self_modify():
+    # Same program as machine.test_self_modify: the block starting at 0 is
+    # compiled on the first pass and must be dropped when it is patched.
+    code = [
+        101, 3, 30, 30,
+        4, 30,
+        1101, 0, 102, 0,
+        1001, 31, 1, 31,
+        1008, 31, 2, 32,
+        1006, 32, 0,
+        99,
+    ] + [0] * 8 + [2, 0, 0]
+    assert _both(code, [])[0] == [5, 15]
+
+
+def test_self_modify_within_block():
+    # The first instruction rewrites the immediate operand of the second.
+    code = [1101, 0, 7, 6, 1101, 0, 0, 11, 4, 11, 99, 0]
+    assert _both(code, [])[0] == [7]
+
+
+def test_grow():
+    # The second instruction writes past the end of memory mid-block.
+    code = [1101, 2, 3, 11, 1101, 1, 1, 50, 4, 50, 99, 0]
+    assert _both(code, [])[0] == [2]
+
+
+def test_fork():
+    code = [3, 21, 1001, 20, 1, 20, 1, 20, 21, 22, 4, 22, 1105, 1, 0] + [0] * 8
+    mac = CompiledMachine(code)
+    assert mac.interact([10], 1) == [11]
+    mac.wait_input()
+    child = mac.fork()
+    assert isinstance(child, CompiledMachine)
+    assert child.interact([100], 1) == [102]
+    assert mac.interact([10], 1) == [12]
+
+
+def test_fork_read_only():
+    # Outputs 7 and its first value, then stores an input at 9.
+    code = [104, 7, 4, 0, 3, 9, 99, 0, 0, 0]
+    mac = CompiledMachine(code)
+    child = mac.fork()
+    assert child.receive(2) == [7, 104]
+    # Nothing was written, so nothing was copied.
+    assert child.memory._data is mac.memory._data
+    child.send([5])
+    assert child.memory._data is not mac.memory._data
+    assert mac.memory.tolist() == code
+
+
+def test_limit():
+    from intcode.machine import _check_limit
+    _check_limit(CompiledMachine)
+
+
+def test_pump():
+    # Same echo program as machine.test_pump; the compiled blocks end in the
+    # output instruction.
+    code = [3, 9, 4, 9, 1005, 9, 0, 99, 0, 0]
+    inbox = RingBuffer(8)
+    outbox = RingBuffer(3)
+    mac = CompiledMachine(code)
+    inbox.write([1, 2, 3, 4, 0])
+    assert mac.pump(inbox, outbox) == BufferFull()
+    assert outbox.read() == [1, 2, 3]
+    assert mac.pump(inbox, outbox) is None
+    assert outbox.read() == [4, 0]
+    assert mac.instructions == 16
@@ -0,0 +1,982 @@
+import abc
+import functools
+import typing
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from intcode.memory import Memory, PagedMemory
+from intcode.ring import RingBuffer
+
+if typing.TYPE_CHECKING:
+    from intcode.profiler import Profiler
+    from intcode.replay import Recorder
+
+AnyMemory = Union[Memory, PagedMemory]
+
+
+class InputInterrupt(typing.NamedTuple):
+    pass
+
+
+class OutputInterrupt(typing.NamedTuple):
+    value: int
+
+
+class BufferFull(typing.NamedTuple):
+    pass
+
+
+class LimitReached(typing.NamedTuple):
+    pass
+
+
+Interrupt = Union[InputInterrupt, OutputInterrupt]
+
+_INPUT = InputInterrupt()
+_FULL = BufferFull()
+_LIMIT = LimitReached()
+# Budget of an unlimited run.
+_NO_LIMIT = 1 << 62
+
+
+class Instruction(typing.NamedTuple):
+    raw: int
+    op: int
+    size: int
+    mode1: int
+    mode2: int
+    mode3: int
+
+
+_SIZES = {1: 4, 2: 4, 3: 2, 4: 2, 5: 3, 6: 3, 7: 4, 8: 4, 9: 2, 99: 1}
+_OUTADDR_ARGS = {1: 3, 2: 3, 3: 1, 7: 3, 8: 3}
+
+
+@functools.lru_cache(maxsize=None)
+def decode(raw: int) -> Instruction:
+    op = raw % 100
+    if op not in _SIZES:
+        raise Exception('Unknown op %d' % op)
+    size = _SIZES[op]
+    modes = (raw // 100 % 10, raw // 1000 % 10, raw // 10000 % 10)
+    for mode in modes[:size - 1]:
+        if mode not in (0, 1, 2):
+            raise Exception('Unknown arg mode %d' % mode)
+    if op in _OUTADDR_ARGS and modes[_OUTADDR_ARGS[op] - 1] == 1:
+        raise Exception('Immediate outaddr is invalid')
+    return Instruction(raw, op, size, *modes)
+
+
+class Superinstruction(typing.NamedTuple):
+    """An instruction fused with the conditional jump following it.
+
+    op is 100 plus the op of the first instruction. tail holds the first
+    instruction's mode3, then the jump's raw opcode, whether it is
+    jump-if-true, and its two modes.
+    """
+    raw: int
+    op: int
+    size: int
+    mode1: int
+    mode2: int
+    tail: Tuple[int, int, bool, int, int]
+
+
+def optimize(data: List[int], pc: int) -> Union[Instruction, Superinstruction]:
+    """Decodes the instruction at pc for the interpreter's dispatch table.
+
+    Arithmetic, comparisons and relative base adjustments directly followed
+    by a conditional jump are fused so that compare-and-branch, call and
+    return sequences take a single dispatch. Only opcodes are baked in;
+    parameters are still read from memory when the superinstruction runs.
+    """
+    ins = decode(data[pc])
+    op = ins.op
+    if op == 1 or op == 2 or op == 7 or op == 8 or op == 9:
+        pc2 = pc + ins.size
+        if pc2 < len(data):
+            return _fuse(ins.raw, data[pc2]) or ins
+    return ins
+
+
+@functools.lru_cache(maxsize=None)
+def _fuse(raw: int, raw2: int) -> Optional[Superinstruction]:
+    ins = decode(raw)
+    try:
+        jump = decode(raw2)
+    except Exception:
+        return None
+    if jump.op != 5 and jump.op != 6:
+        return None
+    return Superinstruction(
+        raw, 100 + ins.op, ins.size, ins.mode1, ins.mode2,
+        (ins.mode3, raw2, jump.op == 5, jump.mode1, jump.mode2))
+
+
+def parse_code(text: str) -> List[int]:
+    return [int(s) for s in text.strip().split(',')]
+
+
+def load_code(path: str) -> List[int]:
+    with open(path) as f:
+        return parse_code(f.read())
+
+
+class IO:
+    @abc.abstractmethod
+    def read_input(self) -> int:
+        ...
+
+    @abc.abstractmethod
+    def write_output(self, value: int) -> None:
+        ...
+
+
+class StaticIO(IO):
+    _input_iter: Iterator[int]
+    outputs: List[int]
+
+    def __init__(self, inputs: Iterable[int]):
+        self._input_iter = iter(inputs)
+        self.outputs = []
+
+    def read_input(self) -> int:
+        return next(self._input_iter)
+
+    def write_output(self, value: int) -> None:
+        self.outputs.append(value)
+
+
+class Snapshot(typing.NamedTuple):
+    """Frozen machine state.
+
+    Machines only ever stop on an instruction boundary, so a machine waiting
+    for input is captured with pc on its input instruction.
+    """
+    mem: AnyMemory
+    pc: int
+    rb: int
+    halted: bool
+    instructions: int
+
+
+class Machine:
+    """Intcode machine.
+
+    Instructions are decoded once per address and kept in a table that is
+    revalidated against the raw opcode on every fetch, so self-modifying
+    programs still behave correctly. The interpreter loop fills the table
+    through optimize(), so some entries are superinstructions; those also
+    revalidate the opcode of the jump they absorbed.
+
+    With paged=True memory is a PagedMemory, which stays small for programs
+    touching wide address ranges. It runs through its own loop that reads
+    instructions from the current page.
+
+    Setting profiler hands execution to it; unset, it costs one attribute
+    check per I/O instruction.
+
+    pump() moves input and output through ring buffers without stopping at
+    every I/O instruction.
+
+    Setting recorder logs every input and periodic checkpoints for replay.
+    """
+    _mem: AnyMemory
+    _pc: int
+    _rb: int
+    _halted: bool
+    _decoded: Dict[int, Union[Instruction, Superinstruction]]
+    instructions: int
+    profiler: Optional['Profiler']
+    recorder: Optional['Recorder']
+    # Buffers of the running pump() call.
+    _inbox: Optional[RingBuffer]
+    _outbox: Optional[RingBuffer]
+
+    def __init__(self, code: Iterable[int], paged: bool = False):
+        self._mem = PagedMemory(code) if paged else Memory(code)
+        self._pc = 0
+        self._rb = 0
+        self._halted = False
+        self._decoded = {}
+        self.instructions = 0
+        self.profiler = None
+        self.recorder = None
+        self._inbox = None
+        self._outbox = None
+
+    @property
+    def memory(self) -> AnyMemory:
+        return self._mem
+
+    @property
+    def halted(self) -> bool:
+        return self._halted
+
+    def snapshot(self) -> Snapshot:
+        """Captures the current state without copying memory.
+
+        Memory is shared copy-on-write between the machine and the snapshot.
+        """
+        return Snapshot(self._mem.share(), self._pc, self._rb, self._halted, self.instructions)
+
+    def restore(self, snapshot: Snapshot) -> None:
+        self._mem = snapshot.mem.share()
+        self._pc = snapshot.pc
+        self._rb = snapshot.rb
+        self._halted = snapshot.halted
+        self.instructions = snapshot.instructions
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> 'Machine':
+        mac = cls(())
+        mac.restore(snapshot)
+        return mac
+
+    def fork(self) -> 'Machine':
+        """Returns an independent machine continuing from the current state."""
+        mac = type(self).from_snapshot(self.snapshot())
+        # Decoded entries are revalidated on fetch, so the table can be shared.
+        mac._decoded = self._decoded
+        return mac
+
+    def wait_input(self) -> None:
+        """Runs until the machine waits for input."""
+        interrupt = self._execute()
+        if interrupt is None:
+            raise Exception('Unexpected halt')
+        if interrupt is not _INPUT:
+            raise Exception('Unexpected output')
+
+    def communicate(self, inputs: Iterable[int]) -> Iterator[int]:
+        input_iter = iter(inputs)
+        while True:
+            interrupt = self._execute()
+            if interrupt is None:
+                break
+            if interrupt is _INPUT:
+                self._feed(next(input_iter))
+            else:
+                yield interrupt.value
+
+    def send(self, inputs: List[int]) -> None:
+        input_pos = 0
+        while input_pos < len(inputs):
+            interrupt = self._execute()
+            if interrupt is None:
+                raise Exception('Unexpected halt')
+            if interrupt is not _INPUT:
+                raise Exception('Unexpected output')
+            self._feed(inputs[input_pos])
+            input_pos += 1
+
+    def receive(self, size: int) -> List[int]:
+        outputs = []
+        while len(outputs) < size:
+            interrupt = self._execute()
+            if interrupt is None:
+                raise Exception('Unexpected halt')
+            if interrupt is _INPUT:
+                raise Exception('Unexpected input')
+            outputs.append(interrupt.value)
+        return outputs
+
+    def interact(self, inputs: List[int], output_size: Optional[int]) -> List[int]:
+        input_pos = 0
+        outputs = []
+        while output_size is None or len(outputs) < output_size:
+            interrupt = self._execute()
+            if interrupt is None:
+                break
+            if interrupt is _INPUT:
+                self._feed(inputs[input_pos])
+                input_pos += 1
+            else:
+                outputs.append(interrupt.value)
+        if input_pos < len(inputs):
+            raise Exception('Excessive output')
+        if output_size is not None and len(outputs) < output_size:
+            raise Exception('Insufficient output')
+        return outputs
+
+    def wait_interrupt(self, next_input: int) -> Optional[Interrupt]:
+        interrupt = self._execute()
+        if interrupt is _INPUT:
+            self._feed(next_input)
+        return interrupt
+
+    def next_interrupt(self, limit: Optional[int] = None) -> Union[Interrupt, LimitReached, None]:
+        """Runs until the next I/O instruction or halt, or until instructions
+        reaches limit.
+
+        On InputInterrupt the machine stays on the input instruction until
+        feed() supplies the value, so the caller can wait for it first.
+        """
+        return self._execute(limit)
+
+    def feed(self, value: int) -> None:
+        """Completes the input instruction the machine is stopped on."""
+        self._feed(value)
+
+    def pump(self, inbox: RingBuffer, outbox: RingBuffer) -> Union[InputInterrupt, BufferFull, None]:
+        """Runs with input taken from inbox and output appended to outbox.
+
+        Returns InputInterrupt when the machine needs input and inbox is
+        empty, BufferFull once outbox is full, or None on halt.
+        """
+        self._inbox = inbox
+        self._outbox = outbox
+        try:
+            while True:
+                if outbox.full():
+                    return _FULL
+                interrupt = self._execute()
+                if interrupt is None or interrupt is _FULL:
+                    return interrupt
+                if interrupt is _INPUT:
+                    if not inbox:
+                        return _INPUT
+                    self._feed(inbox.pop())
+                else:
+                    outbox.push(interrupt.value)
+        finally:
+            self._inbox = None
+            self._outbox = None
+
+    def run(self, io: IO) -> None:
+        while True:
+            interrupt = self._execute()
+            if interrupt is None:
+                break
+            if interrupt is _INPUT:
+                self._feed(io.read_input())
+            else:
+                io.write_output(interrupt.value)
+
+    def _execute(self, limit: Optional[int] = None) -> Union[Interrupt, BufferFull, LimitReached, None]:
+        """Runs until the next I/O instruction or halt.
+
+        Returns InputInterrupt with pc left on the input instruction (call
+        _feed to complete it), OutputInterrupt with pc past the output
+        instruction, or None on halt. With limit set, returns LimitReached
+        before executing past limit instructions in total.
+
+        Within pump(), the fast path reads input from the inbox while it has
+        any and appends output to the outbox, returning BufferFull once the
+        outbox fills up.
+        """
+        if self._halted:
+            return None
+        if self.profiler is not None:
+            if limit is not None:
+                raise Exception('Instruction limits are not supported while profiling')
+            return self.profiler.execute(self)
+        if type(self._mem) is not Memory:
+            return self._execute_paged(limit)
+        # Shared memory is only copied once something is written.
+        data = self._mem._data
+        shared = self._mem._shared
+        decoded = self._decoded
+        # Recorded input goes through _feed.
+        inbox = self._inbox if self.recorder is None else None
+        outbox = self._outbox
+        pc = self._pc
+        rb = self._rb
+        count = 0
+        budget = _NO_LIMIT if limit is None else limit - self.instructions
+        while True:
+            try:
+                while True:
+                    if count >= budget:
+                        self._pc = pc
+                        self._rb = rb
+                        self.instructions += count
+                        return _LIMIT
+                    raw = data[pc]
+                    ins = decoded.get(pc)
+                    if ins is None or ins[0] != raw:
+                        ins = decoded[pc] = optimize(data, pc)
+                    _, op, size, m1, m2, m3 = ins
+                    if op > 100 and count + 1 >= budget:
+                        # No room for both halves; run the first alone.
+                        _, op, size, m1, m2, m3 = decode(raw)
+                    if op > 100:
+                        m3, raw2, nonzero, n1, n2 = m3
+                        pc2 = pc + size
+                        if data[pc2] != raw2:
+                            decoded[pc] = optimize(data, pc)
+                            continue
+                        a = data[pc + 1]
+                        if m1 == 0:
+                            a = data[a]
+                        elif m1 == 2:
+                            a = data[rb + a]
+                        if op == 109:
+                            rb += a
+                        else:
+                            b = data[pc + 2]
+                            if m2 == 0:
+                                b = data[b]
+                            elif m2 == 2:
+                                b = data[rb + b]
+                            c = data[pc + 3]
+                            if m3 == 2:
+                                c += rb
+                            if shared:
+                                data = self._mem._own()
+                                shared = False
+                            if op == 101:
+                                data[c] = a + b
+                            elif op == 102:
+                                data[c] = a * b
+                            elif op == 107:
+                                data[c] = 1 if a < b else 0
+                            else:
+                                data[c] = 1 if a == b else 0
+                            if c == pc2:
+                                # The jump itself was overwritten.
+                                pc = pc2
+                                count += 1
+                                continue
+                        pc = pc2
+                        count += 1
+                        a = data[pc + 1]
+                        if n1 == 0:
+                            a = data[a]
+                        elif n1 == 2:
+                            a = data[rb + a]
+                        if (a != 0) == nonzero:
+                            b = data[pc + 2]
+                            if n2 == 0:
+                                b = data[b]
+                            elif n2 == 2:
+                                b = data[rb + b]
+                            pc = b
+                        else:
+                            pc += 3
+                    elif op == 1 or op == 2 or op == 7 or op == 8:
+                        a = data[pc + 1]
+                        if m1 == 0:
+                            a = data[a]
+                        elif m1 == 2:
+                            a = data[rb + a]
+                        b = data[pc + 2]
+                        if m2 == 0:
+                            b = data[b]
+                        elif m2 == 2:
+                            b = data[rb + b]
+                        c = data[pc + 3]
+                        if m3 == 2:
+                            c += rb
+                        if shared:
+                            data = self._mem._own()
+                            shared = False
+                        if op == 1:
+                            data[c] = a + b
+                        elif op == 2:
+                            data[c] = a * b
+                        elif op == 7:
+                            data[c] = 1 if a < b else 0
+                        else:
+                            data[c] = 1 if a == b else 0
+                        pc += 4
+                    elif op == 5 or op == 6:
+                        a = data[pc + 1]
+                        if m1 == 0:
+                            a = data[a]
+                        elif m1 == 2:
+                            a = data[rb + a]
+                        if (a != 0) == (op == 5):
+                            b = data[pc + 2]
+                            if m2 == 0:
+                                b = data[b]
+                            elif m2 == 2:
+                                b = data[rb + b]
+                            pc = b
+                        else:
+                            pc += 3
+                    elif op == 9:
+                        a = data[pc + 1]
+                        if m1 == 0:
+                            a = data[a]
+                        elif m1 == 2:
+                            a = data[rb + a]
+                        rb += a
+                        pc += 2
+                    elif op == 4:
+                        a = data[pc + 1]
+                        if m1 == 0:
+                            a = data[a]
+                        elif m1 == 2:
+                            a = data[rb + a]
+                        if outbox is None:
+                            self._pc = pc + 2
+                            self._rb = rb
+                            self.instructions += count + 1
+                            return OutputInterrupt(a)
+                        outbox.push(a)
+                        pc += 2
+                        if outbox.full():
+                            self._pc = pc
+                            self._rb = rb
+                            self.instructions += count + 1
+                            return _FULL
+                    elif op == 3:
+                        if not inbox:
+                            self._pc = pc
+                            self._rb = rb
+                            self.instructions += count
+                            return _INPUT
+                        c = data[pc + 1]
+                        if m1 == 2:
+                            c += rb
+                        if shared:
+                            data = self._mem._own()
+                            shared = False
+                        data[c] = inbox.peek()
+                        inbox.pop()
+                        pc += 2
+                    else:
+                        self._pc = pc
+                        self._rb = rb
+                        self._halted = True
+                        self.instructions += count + 1
+                        return None
+                    count += 1
+            except IndexError:
+                # Out-of-range access; let the generic path grow memory.
+                self._pc = pc
+                self._rb = rb
+                self.instructions += count
+                count = 0
+                interrupt = self._step()
+                if interrupt is not None or self._halted:
+                    return interrupt
+                data = self._mem._data
+                shared = self._mem._shared
+                pc = self._pc
+                rb = self._rb
+                budget = _NO_LIMIT if limit is None else limit - self.instructions
+
+    def _execute_paged(self, limit: Optional[int]) -> Union[Interrupt, BufferFull, LimitReached, None]:
+        """_execute for PagedMemory.
+
+        Instructions and their immediate arguments are read straight from
+        the page holding pc; operands go through the memory's item access,
+        which handles missing pages, copy-on-write and overflow. Fetches
+        near the end of a page or from a missing one go through _step.
+        Superinstructions are not used.
+        """
+        mem = self._mem
+        pages = mem._pages
+        page_size = mem._page_size
+        load = mem.__getitem__
+        store = mem.__setitem__
+        decoded = self._decoded
+        inbox = self._inbox if self.recorder is None else None
+        outbox = self._outbox
+        pc = self._pc
+        rb = self._rb
+        count = 0
+        budget = _NO_LIMIT if limit is None else limit - self.instructions
+        while True:
+            if count >= budget:
+                self._pc = pc
+                self._rb = rb
+                self.instructions += count
+                return _LIMIT
+            page = pages.get(pc // page_size)
+            off = pc % page_size
+            if page is None or off + 4 > page_size:
+                self._pc = pc
+                self._rb = rb
+                self.instructions += count
+                count = 0
+                interrupt = self._step()
+                if interrupt is not None or self._halted:
+                    return interrupt
+                pc = self._pc
+                rb = self._rb
+                budget = _NO_LIMIT if limit is None else limit - self.instructions
+                continue
+            raw = page[off]
+            ins = decoded.get(pc)
+            if ins is None or ins[0] != raw or ins[1] > 100:
+                ins = decoded[pc] = decode(raw)
+            _, op, size, m1, m2, m3 = ins
+            if op == 1 or op == 2 or op == 7 or op == 8:
+                a = page[off + 1]
+                if m1 == 0:
+                    a = load(a)
+                elif m1 == 2:
+                    a = load(rb + a)
+                b = page[off + 2]
+                if m2 == 0:
+                    b = load(b)
+                elif m2 == 2:
+                    b = load(rb + b)
+                c = page[off + 3]
+                if m3 == 2:
+                    c += rb
+                if op == 1:
+                    store(c, a + b)
+                elif op == 2:
+                    store(c, a * b)
+                elif op == 7:
+                    store(c, 1 if a < b else 0)
+                else:
+                    store(c, 1 if a == b else 0)
+                pc += 4
+            elif op == 5 or op == 6:
+                a = page[off + 1]
+                if m1 == 0:
+                    a = load(a)
+                elif m1 == 2:
+                    a = load(rb + a)
+                if (a != 0) == (op == 5):
+                    b = page[off + 2]
+                    if m2 == 0:
+                        b = load(b)
+                    elif m2 == 2:
+                        b = load(rb + b)
+                    pc = b
+                else:
+                    pc += 3
+            elif op == 9:
+                a = page[off + 1]
+                if m1 == 0:
+                    a = load(a)
+                elif m1 == 2:
+                    a = load(rb + a)
+                rb += a
+                pc += 2
+            elif op == 4:
+                a = page[off + 1]
+                if m1 == 0:
+                    a = load(a)
+                elif m1 == 2:
+                    a = load(rb + a)
+                if outbox is None:
+                    self._pc = pc + 2
+                    self._rb = rb
+                    self.instructions += count + 1
+                    return OutputInterrupt(a)
+                outbox.push(a)
+                pc += 2
+                if outbox.full():
+                    self._pc = pc
+                    self._rb = rb
+                    self.instructions += count + 1
+                    return _FULL
+            elif op == 3:
+                if not inbox:
+                    self._pc = pc
+                    self._rb = rb
+                    self.instructions += count
+                    return _INPUT
+                c = page[off + 1]
+                if m1 == 2:
+                    c += rb
+                store(c, inbox.peek())
+                inbox.pop()
+                pc += 2
+            else:
+                self._pc = pc
+                self._rb = rb
+                self._halted = True
+                self.instructions += count + 1
+                return None
+            count += 1
+
+    def _step(self) -> Optional[Interrupt]:
+        """Executes a single instruction through the Memory interface.
+
+        Returns the same interrupts as _execute. None is also returned when
+        the instruction completed without I/O; check halted to tell apart.
+        """
+        pc = self._pc
+        ins = self._fetch(pc)
+        op = ins.op
+        if op == 99:
+            self._halted = True
+            self.instructions += 1
+            return None
+        if op == 3:
+            return _INPUT
+        self.instructions += 1
+        if op == 4:
+            self._pc = pc + 2
+            return OutputInterrupt(self._invalue(pc, 1, ins.mode1))
+        if op == 5 or op == 6:
+            if (self._invalue(pc, 1, ins.mode1) != 0) == (op == 5):
+                self._pc = self._invalue(pc, 2, ins.mode2)
+            else:
+                self._pc = pc + 3
+            return None
+        if op == 9:
+            self._rb += self._invalue(pc, 1, ins.mode1)
+            self._pc = pc + 2
+            return None
+        a = self._invalue(pc, 1, ins.mode1)
+        b = self._invalue(pc, 2, ins.mode2)
+        if op == 1:
+            v = a + b
+        elif op == 2:
+            v = a * b
+        elif op == 7:
+            v = 1 if a < b else 0
+        else:
+            v = 1 if a == b else 0
+        self._store(self._outaddr(pc, 3, ins.mode3), v)
+        self._pc = pc + 4
+        return None
+
+    def _feed(self, value: int) -> None:
+        if self.recorder is not None:
+            self.recorder.record(self, value)
+        pc = self._pc
+        ins = self._fetch(pc)
+        assert ins.op == 3, 'Not waiting for input'
+        self._store(self._outaddr(pc, 1, ins.mode1), value)
+        self._pc = pc + 2
+        self.instructions += 1
+
+    def _store(self, addr: int, value: int) -> None:
+        self._mem[addr] = value
+
+    def _fetch(self, pc: int) -> Instruction:
+        raw = self._mem[pc]
+        ins = self._decoded.get(pc)
+        if ins is None or ins.raw != raw:
+            ins = self._decoded[pc] = decode(raw)
+        elif ins.op > 100:
+            return decode(raw)
+        return ins
+
+    def _invalue(self, pc: int, k: int, mode: int) -> int:
+        arg = self._mem[pc + k]
+        if mode == 0:
+            return self._mem[arg]
+        if mode == 1:
+            return arg
+        return self._mem[self._rb + arg]
+
+    def _outaddr(self, pc: int, k: int, mode: int) -> int:
+        arg = self._mem[pc + k]
+        if mode == 2:
+            return arg + self._rb
+        return arg
+
+
+def run(code: List[int], inputs: List[int]) -> List[int]:
+    return list(Machine(code).communicate(inputs))
+
+
+def test_decode():
+    assert decode(1002) == Instruction(1002, 2, 4, 0, 1, 0)
+    assert decode(21107) == Instruction(21107, 7, 4, 1, 1, 2)
+    assert decode(99) == Instruction(99, 99, 1, 0, 0, 0)
+
+
+def test_run():
+    code = [int(s) for s in '109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99'.split(',')]
+    assert run(code, []) == code
+    code = [int(s) for s in '104,1125899906842624,99'.split(',')]
+    assert run(code, []) == [1125899906842624]
+
+
+def test_compare():
+    code = [int(s) for s in '3,3,1108,-1,8,3,4,3,99'.split(',')]
+    assert run(code, [8]) == [1]
+    assert run(code, [7]) == [0]
+    code = [int(s) for s in '3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9'.split(',')]
+    assert run(code, [0]) == [0]
+    assert run(code, [5]) == [1]
+
+
+def test_self_modify():
+    # The second pass through the loop runs the instruction at 0 after it
+    # has been patched from add to multiply.
+    code = [
+        101, 3, 30, 30,
+        4, 30,
+        1101, 0, 102, 0,
+        1001, 31, 1, 31,
+        1008, 31, 2, 32,
+        1006, 32, 0,
+        99,
+    ] + [0] * 8 + [2, 0, 0]
+    mac = Machine(code)
+    assert list(mac.communicate([])) == [5, 15]
+    assert mac.halted
+
+
+def test_optimize():
+    code = [1008, 9, 3, 10, 1005, 10, 0, 99, 0, 0, 0]
+    ins = optimize(code, 0)
+    assert ins == Superinstruction(1008, 108, 4, 0, 1, (0, 1005, True, 0, 1))
+    assert optimize(code, 4) == decode(1005)
+    assert optimize([1101, 1, 2, 0, 99], 0) == decode(1101)
+    assert optimize([109, 1], 0) == decode(109)
+
+
+def test_superinstruction_self_modify():
+    # The add overwrites the jump it is fused with.
+    mac = Machine([1101, 0, 99, 4, 1105, 1, 0])
+    assert list(mac.communicate([])) == []
+    assert mac.halted
+    assert mac.instructions == 2
+    # The loop test at 4..8 is fused on the first pass; the jump is later
+    # patched from jump-if-false to jump-if-true.
+    code = [
+        1001, 30, 1, 30,
+        1008, 30, 3, 31,
+        1006, 31, 0,
+        4, 30,
+        1101, 1005, 0, 8,
+        1007, 30, 5, 32,
+        1005, 32, 0,
+        99,
+    ]
+    mac = Machine(code)
+    assert list(mac.communicate([])) == [3, 4, 5]
+    paged = Machine(code, paged=True)
+    assert list(paged.communicate([])) == [3, 4, 5]
+    assert paged.instructions == mac.instructions
+
+
+def test_superinstruction_grow():
+    # The relative base moves past the end of memory before the fused jump
+    # reads its condition there.
+    mac = Machine([109, 1000, 1205, 0, 0, 99])
+    assert list(mac.communicate([])) == []
+    assert mac.halted
+    assert mac.instructions == 3
+
+
+def test_interact():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    assert Machine(code).interact([8], 1) == [1]
+    mac = Machine(code)
+    assert isinstance(mac.wait_interrupt(8), InputInterrupt)
+    assert mac.wait_interrupt(0) == OutputInterrupt(1)
+    assert mac.wait_interrupt(0) is None
+
+
+def test_communicate_out_of_input():
+    mac = Machine([3, 7, 4, 7, 1105, 1, 0, 0])
+    try:
+        list(mac.communicate([1, 2]))
+    except Exception:
+        pass
+    else:
+        assert False, 'Ran past the end of its inputs'
+
+
+def test_paged():
+    code = [int(s) for s in '109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99'.split(',')]
+    mac = Machine(code, paged=True)
+    assert list(mac.communicate([])) == code
+    fast = Machine(code)
+    fast.interact([], None)
+    assert mac.instructions == fast.instructions
+    # Writes far away from the program only allocate one extra page.
+    mac = Machine([1101, 1, 2, 10 ** 9, 4, 10 ** 9, 99], paged=True)
+    assert list(mac.communicate([])) == [3]
+    assert mac.memory.page_count == 2
+    # Instructions across page boundaries go through _step.
+    mac = Machine((), paged=True)
+    mac._mem = PagedMemory(code, page_size=6)
+    assert list(mac.communicate([])) == code
+    assert mac.instructions == fast.instructions
+
+
+def test_fork():
+    # Echoes the input plus a running counter kept at address 20.
+    code = [3, 21, 1001, 20, 1, 20, 1, 20, 21, 22, 4, 22, 1105, 1, 0] + [0] * 8
+    mac = Machine(code)
+    assert mac.interact([10], 1) == [11]
+    mac.wait_input()
+    snap = mac.snapshot()
+    child = mac.fork()
+    assert child.interact([100], 1) == [102]
+    assert mac.interact([10], 1) == [12]
+    assert mac.interact([10], 1) == [13]
+    assert Machine.from_snapshot(snap).interact([0], 1) == [2]
+    assert child.interact([100], 1) == [103]
+
+
+def test_fork_read_only():
+    # Outputs 7 and its first value, then stores an input at 9.
+    code = [104, 7, 4, 0, 3, 9, 99, 0, 0, 0]
+    mac = Machine(code)
+    child = mac.fork()
+    assert child.receive(2) == [7, 104]
+    # Nothing was written, so nothing was copied.
+    assert child.memory._data is mac.memory._data
+    child.send([5])
+    assert child.memory._data is not mac.memory._data
+    assert mac.memory.tolist() == code
+
+
+def test_next_interrupt():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    mac = Machine(code)
+    assert mac.next_interrupt() == InputInterrupt()
+    mac.feed(8)
+    assert mac.next_interrupt() == OutputInterrupt(1)
+    assert mac.next_interrupt() is None
+
+
+# Counts [20] down from 40, then outputs it. The decrement and jump fuse.
+_COUNTDOWN = [1101, 40, 0, 20, 1001, 20, -1, 20, 1005, 20, 4, 4, 20, 99] + [0] * 7
+
+
+def _check_limit(engine) -> None:
+    """Stops an engine at every instruction count of _COUNTDOWN and compares
+    it with single steps."""
+    ref = Machine(_COUNTDOWN)
+    states = []
+    while not ref.halted:
+        states.append((ref._pc, ref.memory.tolist()))
+        ref._step()
+    for n, (pc, mem) in enumerate(states):
+        mac = engine(_COUNTDOWN)
+        outputs = []
+        interrupt = mac.next_interrupt(n)
+        while not isinstance(interrupt, LimitReached):
+            outputs.append(interrupt.value)
+            interrupt = mac.next_interrupt(n)
+        assert (mac.instructions, mac._pc, mac.memory.tolist()) == (n, pc, mem), n
+        assert outputs + list(mac.communicate([])) == [0]
+
+
+def test_limit():
+    _check_limit(Machine)
+    _check_limit(lambda code: Machine(code, paged=True))
+
+
+def test_pump():
+    # Echoes every input until it reads 0.
+    code = [3, 9, 4, 9, 1005, 9, 0, 99, 0, 0]
+    inbox = RingBuffer(8)
+    outbox = RingBuffer(3)
+    mac = Machine(code)
+    inbox.write([1, 2])
+    assert mac.pump(inbox, outbox) == InputInterrupt()
+    assert outbox.read() == [1, 2]
+    inbox.write([3, 4, 5, 6, 0])
+    assert mac.pump(inbox, outbox) == BufferFull()
+    assert outbox.read() == [3, 4, 5]
+    assert mac.pump(inbox, outbox) is None
+    assert outbox.read() == [6, 0]
+    assert mac.instructions == 22
+    paged = Machine(code, paged=True)
+    inbox.write([7, 0])
+    assert paged.pump(inbox, outbox) is None
+    assert outbox.read() == [7, 0]
+
+
+def test_static_io():
+    io = StaticIO([5])
+    Machine([3, 0, 4, 0, 99]).run(io)
+    assert io.outputs == [5]
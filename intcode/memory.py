@@ -0,0 +1,234 @@
+import array
+import struct
+from typing import Dict, Iterable, List, Set, Union
+
+
+class Memory:
+    _data: List[int]
+    _shared: bool
+
+    def __init__(self, data: Iterable[int]):
+        self._data = list(data)
+        self._shared = False
+
+    def copy(self) -> 'Memory':
+        return Memory(self._data)
+
+    def share(self) -> 'Memory':
+        """Returns a copy-on-write view of this memory.
+
+        Both memories keep using the same list until either is written or
+        grown; that memory then copies the whole list, once.
+        """
+        self._shared = True
+        mem = Memory(())
+        mem._data = self._data
+        mem._shared = True
+        return mem
+
+    def tolist(self) -> List[int]:
+        return list(self._data)
+
+    def _ensure(self, i: int) -> None:
+        if i >= len(self._data):
+            # Growing a shared list would change the other memories too.
+            self._own()
+            self._data.extend(0 for _ in range(i - len(self._data) + 1))
+            assert i == len(self._data) - 1
+
+    def __getitem__(self, i: int) -> int:
+        self._ensure(i)
+        return self._data[i]
+
+    def __setitem__(self, i: int, v: int) -> None:
+        if self._shared:
+            self._own()
+        self._ensure(i)
+        self._data[i] = v
+
+    def _own(self) -> List[int]:
+        if self._shared:
+            self._data = list(self._data)
+            self._shared = False
+        return self._data
+
+
+Page = Union['array.array[int]', List[int]]
+
+
+class PagedMemory:
+    """Sparse memory made of fixed-size pages allocated on first write.
+
+    Pages are array('q') so they cost 8 bytes per cell. A page whose value
+    does not fit in 64 bits is converted to a list of Python ints when
+    promote_overflow is set; otherwise OverflowError propagates.
+
+    Pages are shared copy-on-write between memories returned by share().
+    """
+    _page_size: int
+    _promote_overflow: bool
+    _pages: Dict[int, Page]
+    _owned: Set[int]
+    _size: int
+
+    def __init__(self, data: Iterable[int], page_size: int = 1024, promote_overflow: bool = True):
+        self._page_size = page_size
+        self._promote_overflow = promote_overflow
+        self._pages = {}
+        self._owned = set()
+        values = list(data)
+        self._size = len(values)
+        for start in range(0, len(values), page_size):
+            chunk = values[start:start + page_size]
+            if not any(chunk):
+                continue
+            try:
+                # Packing converts far faster than array() does item by item.
+                page = array.array('q', struct.pack('%dq' % len(chunk), *chunk))
+                page.frombytes(bytes(8 * (page_size - len(chunk))))
+            except struct.error:
+                if not promote_overflow:
+                    raise OverflowError('Value does not fit in 64 bits')
+                page = chunk + [0] * (page_size - len(chunk))
+            self._pages[start // page_size] = page
+            self._owned.add(start // page_size)
+
+    def copy(self) -> 'PagedMemory':
+        mem = PagedMemory((), self._page_size, self._promote_overflow)
+        mem._pages = {n: self._copy_page(page) for n, page in self._pages.items()}
+        mem._owned = set(mem._pages)
+        mem._size = self._size
+        return mem
+
+    def share(self) -> 'PagedMemory':
+        mem = PagedMemory((), self._page_size, self._promote_overflow)
+        mem._pages = dict(self._pages)
+        mem._size = self._size
+        self._owned.clear()
+        return mem
+
+    def tolist(self) -> List[int]:
+        return [self[i] for i in range(self._size)]
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def __getitem__(self, i: int) -> int:
+        try:
+            return self._pages[i // self._page_size][i % self._page_size]
+        except KeyError:
+            # Negative addresses land on negative pages, which never exist.
+            if i < 0:
+                raise Exception('Negative address %d' % i)
+            return 0
+
+    def __setitem__(self, i: int, v: int) -> None:
+        if i < 0:
+            raise Exception('Negative address %d' % i)
+        if i >= self._size:
+            self._size = i + 1
+        n = i // self._page_size
+        if n not in self._owned:
+            page = self._pages.get(n)
+            if page is None:
+                if not v:
+                    return
+                page = array.array('q', bytes(8 * self._page_size))
+            else:
+                page = self._copy_page(page)
+            self._pages[n] = page
+            self._owned.add(n)
+        else:
+            page = self._pages[n]
+        try:
+            page[i % self._page_size] = v
+        except OverflowError:
+            if not self._promote_overflow:
+                raise
+            page = self._pages[n] = page.tolist()
+            page[i % self._page_size] = v
+
+    @staticmethod
+    def _copy_page(page: Page) -> Page:
+        if isinstance(page, list):
+            return list(page)
+        return array.array('q', page)
+
+
+def test_memory():
+    mem = Memory([1, 2, 3])
+    assert mem[1] == 2
+    assert mem[10] == 0
+    mem[12] = 5
+    assert mem.tolist() == [1, 2, 3] + [0] * 9 + [5]
+
+
+def test_share():
+    mem = Memory([1, 2, 3])
+    view = mem.share()
+    assert view._data is mem._data
+    view[0] = 5
+    assert view._data is not mem._data
+    assert mem.tolist() == [1, 2, 3]
+    assert view.tolist() == [5, 2, 3]
+    mem[1] = 7
+    assert mem.tolist() == [1, 7, 3]
+
+
+def test_share_grow():
+    mem = Memory([1, 2, 3])
+    view = mem.share()
+    assert view[10] == 0
+    assert mem.tolist() == [1, 2, 3]
+
+
+def test_paged_memory():
+    mem = PagedMemory([1, 0, 3], page_size=4)
+    assert mem.tolist() == [1, 0, 3]
+    assert mem[1000000] == 0
+    assert mem.page_count == 1
+    mem[1000000] = 7
+    assert mem[1000000] == 7
+    assert mem.page_count == 2
+    mem[5] = 1 << 70
+    assert mem[5] == 1 << 70
+    assert mem[4] == 0
+
+
+def test_paged_memory_overflow():
+    mem = PagedMemory([], promote_overflow=False)
+    try:
+        mem[0] = 1 << 70
+    except OverflowError:
+        pass
+    else:
+        assert False, 'OverflowError not raised'
+    try:
+        PagedMemory([1 << 70], promote_overflow=False)
+    except OverflowError:
+        pass
+    else:
+        assert False, 'OverflowError not raised'
+
+
+def test_paged_memory_copy():
+    mem = PagedMemory([1, 2, 3, 4, 5, 1 << 70], page_size=2)
+    copy = mem.copy()
+    page = mem._pages[0]
+    mem[0] = 9
+    # Copying leaves the original owning its pages, so it writes in place.
+    assert mem._pages[0] is page
+    assert copy.tolist() == [1, 2, 3, 4, 5, 1 << 70]
+    assert mem.tolist() == [9, 2, 3, 4, 5, 1 << 70]
+
+
+def test_paged_memory_share():
+    mem = PagedMemory([1, 2, 3, 4, 5], page_size=2)
+    view = mem.share()
+    view[0] = 9
+    assert mem.tolist() == [1, 2, 3, 4, 5]
+    assert view.tolist() == [9, 2, 3, 4, 5]
+    assert view._pages[1] is mem._pages[1]
+    mem[4] = 0
+    assert view[4] == 5
@@ -0,0 +1,160 @@
+"""Networks of Intcode NICs running as asyncio tasks.
+
+Every NIC is a coroutine owning one machine and an asyncio.Queue of (x, y)
+packets. A NIC reading input with an empty queue is given -1 once; if it asks
+again without sending anything in between it blocks on its queue instead of
+spinning. The network is idle exactly when every NIC is blocked and no packet
+is queued, at which point idle() returns.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Iterable, List, Tuple, TypeVar
+
+from intcode.machine import InputInterrupt, Machine
+
+T = TypeVar('T')
+
+Packet = Tuple[int, int]
+
+NAT_ADDRESS = 255
+
+
+class Network:
+    size: int
+    # Packets sent to NAT_ADDRESS, in order.
+    nat: 'asyncio.Queue[Packet]'
+    _machines: List[Machine]
+    _queues: 'List[asyncio.Queue[Packet]]'
+    _blocked: int
+    _pending: int
+    _idle: asyncio.Event
+
+    def __init__(self, code: Iterable[int], size: int, engine: Callable[[List[int]], Machine] = Machine):
+        code = list(code)
+        self.size = size
+        self.nat = asyncio.Queue()
+        self._machines = [engine(code) for _ in range(size)]
+        self._queues = [asyncio.Queue() for _ in range(size)]
+        self._blocked = 0
+        self._pending = 0
+        self._idle = asyncio.Event()
+
+    def send(self, address: int, packet: Packet) -> None:
+        if address == NAT_ADDRESS:
+            self.nat.put_nowait(packet)
+            return
+        if not 0 <= address < self.size:
+            raise Exception('Unknown address %d' % address)
+        self._pending += 1
+        self._idle.clear()
+        self._queues[address].put_nowait(packet)
+
+    async def idle(self) -> None:
+        """Waits until every NIC is blocked on an empty queue."""
+        await self._idle.wait()
+
+    async def run(self, nat: Callable[['Network'], Awaitable[T]]) -> T:
+        """Boots every NIC and returns the result of nat(self).
+
+        NICs are cancelled once nat returns; an exception in a NIC is raised
+        from here.
+        """
+        nics = [asyncio.ensure_future(self._nic(i)) for i in range(self.size)]
+        main = asyncio.ensure_future(nat(self))
+        try:
+            done, _ = await asyncio.wait(nics + [main], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not main:
+                    task.result()
+                    raise Exception('NIC stopped')
+            return main.result()
+        finally:
+            for task in nics + [main]:
+                task.cancel()
+
+    async def _nic(self, address: int) -> None:
+        mac = self._machines[address]
+        queue = self._queues[address]
+        mac.send([address])
+        polled = False
+        while True:
+            interrupt = mac.next_interrupt()
+            if interrupt is None:
+                raise Exception('NIC %d halted' % address)
+            if not isinstance(interrupt, InputInterrupt):
+                x, y = mac.receive(2)
+                self.send(interrupt.value, (x, y))
+                polled = False
+                # Let the receivers run before producing more.
+                await asyncio.sleep(0)
+                continue
+            if queue.empty() and not polled:
+                mac.feed(-1)
+                polled = True
+                continue
+            if queue.empty():
+                self._blocked += 1
+                if self._blocked == self.size and self._pending == 0:
+                    self._idle.set()
+                try:
+                    x, y = await queue.get()
+                finally:
+                    self._blocked -= 1
+            else:
+                x, y = queue.get_nowait()
+            self._pending -= 1
+            mac.feed(x)
+            mac.send([y])
+            polled = False
+
+
+def run_network(code: Iterable[int], size: int, nat: Callable[[Network], Awaitable[T]]) -> T:
+    return asyncio.run(Network(code, size).run(nat))
+
+
+def test_network_idle():
+    # Every NIC polls forever without sending; idle() must return exactly
+    # once all of them are blocked.
+    code = [3, 10, 3, 10, 1105, 1, 0] + [0] * 4
+
+    async def nat(network: Network) -> int:
+        await network.idle()
+        return network._blocked
+
+    assert run_network(code, 200, nat) == 200
+
+
+def test_network_relay():
+    # Every NIC forwards a packet to the next address with y + 1; the last
+    # sends it to the NAT.
+    size = 5
+    code = [
+        3, 100,                  # 0: in address
+        3, 101,                  # 2: in x
+        1008, 101, -1, 103,      # 4: [103] = x == -1
+        1005, 103, 2,            # 8: poll again on -1
+        3, 102,                  # 11: in y
+        1001, 102, 1, 102,       # 13: y += 1
+        1001, 100, 1, 104,       # 17: [104] = address + 1
+        1007, 104, size, 103,    # 21: [103] = next < size
+        1005, 103, 32,           # 25: if so, send to it
+        1101, 255, 0, 104,       # 28: otherwise to the NAT
+        4, 104, 4, 101, 4, 102,  # 32: out destination, x, y
+        1105, 1, 2,              # 38: back to input
+    ]
+
+    async def nat(network: Network) -> Packet:
+        network.send(0, (7, 0))
+        packet = await network.nat.get()
+        await network.idle()
+        return packet
+
+    assert run_network(code, size, nat) == (7, size)
+
+
+def test_send_before_run():
+    network = Network([99], 2)
+    network.send(1, (3, 4))
+    network.send(NAT_ADDRESS, (5, 6))
+    assert network.nat.get_nowait() == (5, 6)
+    assert network._queues[1].get_nowait() == (3, 4)
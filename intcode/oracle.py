@@ -0,0 +1,72 @@
+import collections
+import typing
+from typing import Callable, Iterable, List, Tuple
+
+from intcode.machine import Machine
+
+
+class CacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class Oracle:
+    """A deterministic Intcode program queried as a pure function.
+
+    The program is booted once up to its first input instruction; every
+    query forks that machine, feeds the inputs and collects all outputs
+    until it halts or asks for more input. Results are kept in an LRU
+    cache keyed by the input tuple.
+    """
+    _boot: Machine
+    _cache: 'collections.OrderedDict[Tuple[int, ...], Tuple[int, ...]]'
+    _maxsize: int
+    _hits: int
+    _misses: int
+
+    def __init__(self, code: Iterable[int], engine: Callable[[List[int]], Machine] = Machine,
+                 maxsize: int = 1 << 16):
+        self._boot = engine(list(code))
+        self._boot.wait_input()
+        self._cache = collections.OrderedDict()
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+
+    def __call__(self, *inputs: int) -> Tuple[int, ...]:
+        outputs = self._cache.get(inputs)
+        if outputs is not None:
+            self._hits += 1
+            self._cache.move_to_end(inputs)
+            return outputs
+        self._misses += 1
+        outputs = tuple(self._boot.fork().communicate(inputs))
+        self._cache[inputs] = outputs
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+        return outputs
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self._maxsize, len(self._cache))
+
+
+def test_oracle():
+    # Outputs [x] * [y] after some setup work before the first input.
+    code = [1101, 2, 3, 20, 3, 21, 3, 22, 2, 21, 22, 23, 4, 23, 99]
+    oracle = Oracle(code, maxsize=2)
+    assert oracle(3, 4) == (12,)
+    assert oracle(3, 4) == (12,)
+    assert oracle(5, 6) == (30,)
+    assert oracle(7, 8) == (56,)
+    assert oracle.cache_info() == CacheInfo(hits=1, misses=3, maxsize=2, currsize=2)
+    # (3, 4) was evicted as least recently used.
+    assert oracle(3, 4) == (12,)
+    assert oracle.cache_info().misses == 4
+    assert oracle.cache_info().hit_rate == 0.2
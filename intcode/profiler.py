@@ -0,0 +1,223 @@
+"""Execution profiler for Intcode programs.
+
+    mac = Machine(code)
+    mac.profiler = Profiler()
+    ...
+    print(mac.profiler.report())
+
+A profiled machine runs every instruction through the generic single-step
+path and records per-pc execution counts, an opcode histogram, read and
+write counts per address, taken backward jumps and the wall time spent
+between stopping on an I/O instruction and being resumed.
+
+    python -m intcode.profiler CASE [--top N]
+
+profiles one of the benchmark cases.
+"""
+
+import argparse
+import collections
+import time
+import typing
+from typing import Counter, Dict, List, Optional, Tuple
+
+from intcode.machine import _INPUT, Instruction, Interrupt, Machine
+
+_NAMES = {1: 'add', 2: 'mul', 3: 'in', 4: 'out', 5: 'jnz', 6: 'jz', 7: 'lt', 8: 'eq', 9: 'arb', 99: 'halt'}
+
+
+class Loop(typing.NamedTuple):
+    start: int
+    end: int
+    # Times the backward jump at end was taken.
+    iterations: int
+    # Instructions executed at addresses in [start, end].
+    instructions: int
+
+
+class Profiler:
+    counts: Counter[int]
+    opcodes: Counter[int]
+    reads: Counter[int]
+    writes: Counter[int]
+    # (target, pc) of taken backward jumps.
+    back_edges: Counter[Tuple[int, int]]
+    # Seconds spent stopped on the I/O instruction at each pc.
+    blocked: Dict[int, float]
+    _stopped_pc: Optional[int]
+    _stopped_at: float
+    _input_pc: Optional[int]
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.opcodes = collections.Counter()
+        self.reads = collections.Counter()
+        self.writes = collections.Counter()
+        self.back_edges = collections.Counter()
+        self.blocked = collections.defaultdict(float)
+        self._stopped_pc = None
+        self._stopped_at = 0.0
+        self._input_pc = None
+
+    def execute(self, mac: Machine) -> Optional[Interrupt]:
+        """Machine._execute with every instruction recorded."""
+        if self._stopped_pc is not None:
+            self.blocked[self._stopped_pc] += time.perf_counter() - self._stopped_at
+            self._stopped_pc = None
+        # Input instructions complete in _feed, so they are recorded once the
+        # machine has moved past them.
+        if self._input_pc is not None and mac._pc != self._input_pc:
+            self._record_input(self._input_pc, mac._rb, mac)
+        self._input_pc = None
+        while True:
+            pc = mac._pc
+            ins = mac._fetch(pc)
+            if ins.op == 3:
+                self._stop(pc)
+                self._input_pc = pc
+                return _INPUT
+            self._record(pc, ins, mac)
+            interrupt = mac._step()
+            if interrupt is not None:
+                self._stop(pc)
+                return interrupt
+            if mac.halted:
+                return None
+            if mac._pc <= pc and (ins.op == 5 or ins.op == 6):
+                self.back_edges[(mac._pc, pc)] += 1
+
+    def loops(self) -> List[Loop]:
+        """Loops closed by backward jumps, hottest first."""
+        loops = []
+        for (start, end), iterations in self.back_edges.items():
+            instructions = sum(n for pc, n in self.counts.items() if start <= pc <= end)
+            loops.append(Loop(start, end, iterations, instructions))
+        loops.sort(key=lambda loop: loop.instructions, reverse=True)
+        return loops
+
+    def report(self, top: int = 10) -> str:
+        total = sum(self.counts.values())
+        lines = ['%d instructions, %d distinct pcs' % (total, len(self.counts))]
+
+        lines.append('')
+        lines.append('hot loops:')
+        lines.append('  %-13s %10s %12s %6s' % ('range', 'iterations', 'instructions', '%'))
+        for loop in self.loops()[:top]:
+            lines.append('  %5d..%-6d %10d %12d %5.1f%%' % (
+                loop.start, loop.end, loop.iterations, loop.instructions,
+                100 * loop.instructions / total if total else 0))
+
+        lines.append('')
+        lines.append('hot pcs:')
+        for pc, n in self.counts.most_common(top):
+            lines.append('  %6d %12d' % (pc, n))
+
+        lines.append('')
+        lines.append('opcodes:')
+        for op, n in self.opcodes.most_common():
+            lines.append('  %-5s %12d' % (_NAMES[op], n))
+
+        for title, counter in [('reads', self.reads), ('writes', self.writes)]:
+            lines.append('')
+            lines.append('%s:' % title)
+            for addr, n in counter.most_common(top):
+                lines.append('  %6d %12d' % (addr, n))
+
+        lines.append('')
+        lines.append('blocked on I/O:')
+        for pc, seconds in sorted(self.blocked.items(), key=lambda item: item[1], reverse=True)[:top]:
+            lines.append('  %6d %9.3fs' % (pc, seconds))
+        return '\n'.join(lines)
+
+    def _stop(self, pc: int) -> None:
+        self._stopped_pc = pc
+        self._stopped_at = time.perf_counter()
+
+    def _read(self, pc: int, k: int, mode: int, mac: Machine) -> None:
+        if mode == 0:
+            self.reads[mac.memory[pc + k]] += 1
+        elif mode == 2:
+            self.reads[mac._rb + mac.memory[pc + k]] += 1
+
+    def _record(self, pc: int, ins: Instruction, mac: Machine) -> None:
+        self.counts[pc] += 1
+        op = ins.op
+        self.opcodes[op] += 1
+        if op == 1 or op == 2 or op == 7 or op == 8:
+            self._read(pc, 1, ins.mode1, mac)
+            self._read(pc, 2, ins.mode2, mac)
+            self.writes[mac._outaddr(pc, 3, ins.mode3)] += 1
+        elif op == 4 or op == 9:
+            self._read(pc, 1, ins.mode1, mac)
+        elif op == 5 or op == 6:
+            self._read(pc, 1, ins.mode1, mac)
+            if (mac._invalue(pc, 1, ins.mode1) != 0) == (op == 5):
+                self._read(pc, 2, ins.mode2, mac)
+
+    def _record_input(self, pc: int, rb: int, mac: Machine) -> None:
+        ins = mac._fetch(pc)
+        self.counts[pc] += 1
+        self.opcodes[3] += 1
+        arg = mac.memory[pc + 1]
+        self.writes[arg + rb if ins.mode1 == 2 else arg] += 1
+
+
+def main():
+    from intcode.benchmark import ENGINES, _load, cases
+
+    by_name = {case.name: case for case in cases()}
+    parser = argparse.ArgumentParser(description='Profile an Intcode benchmark case')
+    parser.add_argument('case', choices=sorted(by_name))
+    parser.add_argument('--engine', choices=['fast', 'paged', 'compiled'], default='fast')
+    parser.add_argument('--top', type=int, default=10, help='rows per table')
+    args = parser.parse_args()
+
+    case = by_name[args.case]
+    mac = ENGINES[args.engine](_load(case))
+    mac.profiler = Profiler()
+    for _ in mac.communicate(case.inputs):
+        pass
+    print(mac.profiler.report(args.top))
+
+
+def test_profiler():
+    # Counts down from 3 at address 12, outputting each value.
+    code = [4, 12, 1001, 12, -1, 12, 1005, 12, 0, 99, 0, 0, 3]
+    mac = Machine(code)
+    mac.profiler = Profiler()
+    assert list(mac.communicate([])) == [3, 2, 1]
+    assert mac.profiler.counts == {0: 3, 2: 3, 6: 3, 9: 1}
+    assert sum(mac.profiler.counts.values()) == mac.instructions
+    assert mac.profiler.opcodes == {4: 3, 1: 3, 5: 3, 99: 1}
+    assert mac.profiler.reads == {12: 9}
+    assert mac.profiler.writes == {12: 3}
+    assert mac.profiler.back_edges == {(0, 6): 2}
+    assert mac.profiler.loops() == [Loop(0, 6, 2, 9)]
+    assert set(mac.profiler.blocked) == {0}
+    assert 'hot loops' in mac.profiler.report()
+
+
+def test_profiler_input():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    mac = Machine(code)
+    mac.profiler = Profiler()
+    mac.wait_input()
+    mac.wait_input()
+    assert mac.interact([8], 1) == [1]
+    assert mac.profiler.counts == {0: 1, 2: 1, 6: 1}
+    assert mac.profiler.writes == {9: 2}
+    assert sum(mac.profiler.counts.values()) == mac.instructions
+
+
+def test_instruction_count():
+    code = [int(s) for s in '109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99'.split(',')]
+    mac = Machine(code)
+    mac.profiler = Profiler()
+    assert list(mac.communicate([])) == code
+    plain = Machine(code)
+    plain.interact([], None)
+    assert plain.instructions == mac.instructions == sum(mac.profiler.counts.values())
+
+
+if __name__ == '__main__':
+    main()
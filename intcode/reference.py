@@ -0,0 +1,102 @@
+from typing import Optional, Union
+
+from intcode.machine import _INPUT, _LIMIT, Interrupt, LimitReached, Machine, OutputInterrupt
+
+
+class ReferenceMachine(Machine):
+    """Intcode machine running the original per-day interpreter loop.
+
+    Every instruction re-derives its parameter modes from the raw opcode.
+    Kept as a baseline for benchmarks and for cross-checking faster engines.
+    """
+
+    def _execute(self, limit: Optional[int] = None) -> Union[Interrupt, LimitReached, None]:
+        if self._halted:
+            return None
+        mem = self._mem
+        pc = self._pc
+        rb = self._rb
+
+        while True:
+            if limit is not None and self.instructions >= limit:
+                self._pc, self._rb = pc, rb
+                return _LIMIT
+            op = mem[pc] % 100
+
+            def invalue(k):
+                arg = mem[pc + k]
+                mode = mem[pc] // 100 // (10 ** (k - 1)) % 10
+                if mode == 0:
+                    return mem[arg]
+                if mode == 1:
+                    return arg
+                if mode == 2:
+                    return mem[rb + arg]
+                raise Exception('Unknown arg mode %d' % mode)
+
+            def outaddr(k):
+                mode = mem[pc] // 100 // (10 ** (k - 1)) % 10
+                if mode == 0:
+                    return mem[pc + k]
+                if mode == 1:
+                    raise Exception('Immediate outaddr is invalid')
+                if mode == 2:
+                    return mem[pc + k] + rb
+                raise Exception('Unknown arg mode %d' % mode)
+
+            self.instructions += 1
+            if op == 99:
+                self._halted = True
+                break
+            elif op == 1:
+                mem[outaddr(3)] = invalue(1) + invalue(2)
+                pc += 4
+            elif op == 2:
+                mem[outaddr(3)] = invalue(1) * invalue(2)
+                pc += 4
+            elif op == 3:
+                self.instructions -= 1
+                self._pc, self._rb = pc, rb
+                return _INPUT
+            elif op == 4:
+                value = invalue(1)
+                self._pc, self._rb = pc + 2, rb
+                return OutputInterrupt(value)
+            elif op == 5:
+                if invalue(1) != 0:
+                    pc = invalue(2)
+                else:
+                    pc += 3
+            elif op == 6:
+                if invalue(1) == 0:
+                    pc = invalue(2)
+                else:
+                    pc += 3
+            elif op == 7:
+                mem[outaddr(3)] = 1 if invalue(1) < invalue(2) else 0
+                pc += 4
+            elif op == 8:
+                mem[outaddr(3)] = 1 if invalue(1) == invalue(2) else 0
+                pc += 4
+            elif op == 9:
+                rb += invalue(1)
+                pc += 2
+            else:
+                raise Exception('Unknown op %d' % op)
+
+        self._pc, self._rb = pc, rb
+        return None
+
+
+def test_run():
+    code = [int(s) for s in '109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99'.split(',')]
+    mac = ReferenceMachine(code)
+    assert list(mac.communicate([])) == code
+    fast = Machine(code)
+    list(fast.communicate([]))
+    assert mac.instructions == fast.instructions
+
+
+def test_limit():
+    from intcode.machine import _check_limit
+    _check_limit(ReferenceMachine)
@@ -0,0 +1,373 @@
+"""Deterministic record and replay of Intcode sessions.
+
+    mac = Machine(code)
+    mac.recorder = Recorder(mac)
+    ...                        # drive the machine as usual
+    mac.recorder.save('session.log')
+
+    replay = Replay.load('session.log')
+    mac, next_input = replay.seek(123456789)
+
+A Recorder logs every input value and, at input instructions at least
+interval instructions apart, a checkpoint of the machine state. seek()
+restores the last checkpoint at or before the requested instruction count
+and runs from there with an instruction limit, so it costs the distance to that checkpoint
+rather than a replay from boot.
+
+The log is zlib-compressed zigzag varints; checkpoint memory is stored as
+a sparse diff against the memory the recording started from.
+"""
+
+import bisect
+import typing
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+from intcode.machine import _INPUT, InputInterrupt, Interrupt, Machine, Snapshot
+from intcode.memory import Memory
+
+MAGIC = b'ICRL\x01'
+
+Engine = Callable[[List[int]], Machine]
+
+
+class Checkpoint(typing.NamedTuple):
+    # Number of inputs consumed before the snapshot.
+    input_pos: int
+    snapshot: Snapshot
+
+
+class Divergence(typing.NamedTuple):
+    # Instructions executed at the last stop where both engines agreed,
+    # memory included.
+    start: int
+    # Instruction count after which the engines' states first differ, or
+    # the count at the differing stop if only its interrupts do.
+    instruction: int
+    # Instructions executed by each engine at the first stop that differs.
+    instructions: Tuple[int, int]
+    pcs: Tuple[int, int]
+    interrupts: Tuple[Optional[Interrupt], Optional[Interrupt]]
+    # Memory addresses holding different values, if memory was compared.
+    addrs: List[int]
+
+
+class Recorder:
+    interval: int
+    inputs: List[int]
+    checkpoints: List[Checkpoint]
+
+    def __init__(self, mac: Machine, interval: int = 100000):
+        self.interval = interval
+        self.inputs = []
+        self.checkpoints = [Checkpoint(0, mac.snapshot())]
+
+    def record(self, mac: Machine, value: int) -> None:
+        """Called by the machine before it consumes an input."""
+        if mac.instructions - self.checkpoints[-1].snapshot.instructions >= self.interval:
+            self.checkpoints.append(Checkpoint(len(self.inputs), mac.snapshot()))
+        self.inputs.append(value)
+
+    def replay(self) -> 'Replay':
+        return Replay(list(self.inputs), list(self.checkpoints))
+
+    def dumps(self) -> bytes:
+        return self.replay().dumps()
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.dumps())
+
+
+class Replay:
+    inputs: List[int]
+    checkpoints: List[Checkpoint]
+
+    def __init__(self, inputs: List[int], checkpoints: List[Checkpoint]):
+        if not checkpoints or checkpoints[0].input_pos != 0:
+            raise Exception('Replay must start with a checkpoint before any input')
+        self.inputs = inputs
+        self.checkpoints = checkpoints
+
+    @classmethod
+    def loads(cls, data: bytes) -> 'Replay':
+        if not data.startswith(MAGIC):
+            raise Exception('Not an Intcode replay log')
+        payload = zlib.decompress(data[len(MAGIC):])
+        values = _decode(payload)
+        pos = 0
+
+        def take(n: int) -> List[int]:
+            nonlocal pos
+            if pos + n > len(values):
+                raise Exception('Truncated replay log')
+            pos += n
+            return values[pos - n:pos]
+
+        base = take(take(1)[0])
+        inputs = take(take(1)[0])
+        checkpoints = []
+        for _ in range(take(1)[0]):
+            input_pos, instructions, pc, rb, halted, size, changes = take(7)
+            mem = (base + [0] * max(0, size - len(base)))[:size]
+            addr = 0
+            for _ in range(changes):
+                delta, value = take(2)
+                addr += delta
+                mem[addr] = value
+            snapshot = Snapshot(Memory(mem), pc, rb, bool(halted), instructions)
+            checkpoints.append(Checkpoint(input_pos, snapshot))
+        return cls(inputs, checkpoints)
+
+    @classmethod
+    def load(cls, path: str) -> 'Replay':
+        with open(path, 'rb') as f:
+            return cls.loads(f.read())
+
+    def dumps(self) -> bytes:
+        base = self.checkpoints[0].snapshot.mem.tolist()
+        values = [len(base)] + base + [len(self.inputs)] + self.inputs + [len(self.checkpoints)]
+        for checkpoint in self.checkpoints:
+            snapshot = checkpoint.snapshot
+            mem = snapshot.mem.tolist()
+            changes = []
+            prev = 0
+            for addr, value in enumerate(mem):
+                if value != (base[addr] if addr < len(base) else 0):
+                    changes.extend((addr - prev, value))
+                    prev = addr
+            values.extend((
+                checkpoint.input_pos, snapshot.instructions, snapshot.pc, snapshot.rb,
+                int(snapshot.halted), len(mem), len(changes) // 2))
+            values.extend(changes)
+        return MAGIC + zlib.compress(_encode(values))
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.dumps())
+
+    def seek(self, instructions: int, engine: Engine = Machine) -> Tuple[Machine, int]:
+        """Returns a machine that has executed exactly instructions
+        instructions, and the index of the next input it will read."""
+        keys = [c.snapshot.instructions for c in self.checkpoints]
+        checkpoint = self.checkpoints[bisect.bisect_right(keys, instructions) - 1]
+        mac = _boot(engine, checkpoint)
+        pos = checkpoint.input_pos
+        while mac.instructions < instructions:
+            interrupt = mac.next_interrupt(instructions)
+            if interrupt is None and mac.instructions < instructions:
+                raise Exception('Replay halts after %d instructions' % mac.instructions)
+            if isinstance(interrupt, InputInterrupt) and mac.instructions < instructions:
+                if pos == len(self.inputs):
+                    raise Exception('Replay runs out of input after %d instructions' % mac.instructions)
+                mac.feed(self.inputs[pos])
+                pos += 1
+        return mac, pos
+
+    def outputs(self, engine: Engine = Machine) -> List[int]:
+        """Replays the whole session from its first checkpoint."""
+        return list(_boot(engine, self.checkpoints[0]).communicate(self.inputs))
+
+
+def find_divergence(replay: Replay, engine_a: Engine, engine_b: Engine) -> Optional[Divergence]:
+    """Finds the first instruction after which two engines disagree on a replay.
+
+    Checkpoint segments are run in order on both engines, each from its
+    recorded state, comparing interrupts, pc, relative base, instruction
+    counts and (at inputs and halt) memory at every I/O stop. Once a stop
+    differs, the engines are rerun from the segment's checkpoint with
+    instruction limits, bisecting between the last stop where they fully
+    agreed and the differing one down to a single instruction. A divergence
+    in segment k costs running segments 0..k in full plus O(log n) reruns
+    of segment k, where n is the length of the run that diverged.
+    """
+    for k, checkpoint in enumerate(replay.checkpoints):
+        end = replay.checkpoints[k + 1].input_pos if k + 1 < len(replay.checkpoints) else len(replay.inputs)
+        a = _boot(engine_a, checkpoint)
+        b = _boot(engine_b, checkpoint)
+        pos = checkpoint.input_pos
+        start = a.instructions
+        while True:
+            ia = a.next_interrupt()
+            ib = b.next_interrupt()
+            addrs = []
+            if ia is None or isinstance(ia, InputInterrupt):
+                addrs = _diff(a.memory.tolist(), b.memory.tolist())
+            if (type(ia) is not type(ib) or ia != ib or a._pc != b._pc or a._rb != b._rb
+                    or a.instructions != b.instructions or addrs):
+                hi = min(a.instructions, b.instructions)
+                lo = start
+                if _agree(replay, checkpoint, engine_a, engine_b, hi):
+                    # Only the interrupts differ, so the I/O instruction does.
+                    lo = hi - 1
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    if _agree(replay, checkpoint, engine_a, engine_b, mid):
+                        lo = mid
+                    else:
+                        hi = mid
+                return Divergence(
+                    start, hi, (a.instructions, b.instructions), (a._pc, b._pc), (ia, ib), addrs)
+            if ia is None:
+                return None
+            if isinstance(ia, InputInterrupt):
+                start = a.instructions
+                if pos == end:
+                    break
+                a.feed(replay.inputs[pos])
+                b.feed(replay.inputs[pos])
+                pos += 1
+    return None
+
+
+def _agree(replay: Replay, checkpoint: Checkpoint, engine_a: Engine, engine_b: Engine, n: int) -> bool:
+    """Whether both engines reach the same state after n instructions."""
+    a = _run_to(replay, checkpoint, engine_a, n)
+    b = _run_to(replay, checkpoint, engine_b, n)
+    return ((a.instructions, a._pc, a._rb, a.halted) == (b.instructions, b._pc, b._rb, b.halted)
+            and not _diff(a.memory.tolist(), b.memory.tolist()))
+
+
+def _run_to(replay: Replay, checkpoint: Checkpoint, engine: Engine, n: int) -> Machine:
+    mac = _boot(engine, checkpoint)
+    pos = checkpoint.input_pos
+    while mac.instructions < n:
+        interrupt = mac.next_interrupt(n)
+        if interrupt is None:
+            break
+        if isinstance(interrupt, InputInterrupt) and mac.instructions < n:
+            if pos == len(replay.inputs):
+                break
+            mac.feed(replay.inputs[pos])
+            pos += 1
+    return mac
+
+
+def _diff(mem_a: List[int], mem_b: List[int]) -> List[int]:
+    size = max(len(mem_a), len(mem_b))
+    mem_a += [0] * (size - len(mem_a))
+    mem_b += [0] * (size - len(mem_b))
+    return [i for i in range(size) if mem_a[i] != mem_b[i]]
+
+
+def _boot(engine: Engine, checkpoint: Checkpoint) -> Machine:
+    mac = engine([])
+    mac.restore(checkpoint.snapshot)
+    return mac
+
+
+def _encode(values: List[int]) -> bytes:
+    out = bytearray()
+    for value in values:
+        n = value * 2 if value >= 0 else -value * 2 - 1
+        while n >= 0x80:
+            out.append(n & 0x7f | 0x80)
+            n >>= 7
+        out.append(n)
+    return bytes(out)
+
+
+def _decode(data: bytes) -> List[int]:
+    values = []
+    n = 0
+    shift = 0
+    for byte in data:
+        n |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(n >> 1 if not n & 1 else -(n >> 1) - 1)
+        n = 0
+        shift = 0
+    if shift:
+        raise Exception('Truncated replay log')
+    return values
+
+
+# Sums its inputs into [20] until it reads 0, echoing the running sum.
+_SUM = [3, 21, 1, 20, 21, 20, 4, 20, 1005, 21, 0, 99] + [0] * 10
+
+
+def test_encode():
+    values = [0, 1, -1, 63, -64, 64, 1 << 70, -(1 << 70)]
+    assert _decode(_encode(values)) == values
+
+
+def test_record_replay():
+    mac = Machine(_SUM)
+    mac.recorder = Recorder(mac, interval=10)
+    inputs = list(range(1, 30)) + [0]
+    outputs = list(mac.communicate(inputs))
+    assert len(mac.recorder.checkpoints) > 3
+    replay = Replay.loads(mac.recorder.dumps())
+    assert replay.inputs == inputs
+    assert replay.outputs() == outputs
+
+    for target in [0, 7, 25, 60, mac.instructions]:
+        ref = Machine(_SUM)
+        fed = 0
+        while ref.instructions < target:
+            if ref._step() is _INPUT:
+                ref._feed(inputs[fed])
+                fed += 1
+        sought, pos = replay.seek(target)
+        assert sought.snapshot()[1:] == ref.snapshot()[1:]
+        assert sought.memory.tolist() == ref.memory.tolist()
+        assert pos == fed
+
+
+def test_find_divergence():
+    from intcode.jit import CompiledMachine
+    from intcode.machine import OutputInterrupt
+
+    class Broken(Machine):
+        # Reports sums above 100 off by one.
+        def _execute(self, limit=None):
+            interrupt = super()._execute(limit)
+            if type(interrupt) is OutputInterrupt and interrupt.value > 100:
+                return OutputInterrupt(interrupt.value + 1)
+            return interrupt
+
+    mac = Machine(_SUM)
+    mac.recorder = Recorder(mac, interval=20)
+    list(mac.communicate(list(range(1, 30)) + [0]))
+    replay = mac.recorder.replay()
+    assert find_divergence(replay, Machine, CompiledMachine) is None
+    divergence = find_divergence(replay, Machine, Broken)
+    # 1 + ... + 14 = 105 is the first sum above 100.
+    assert divergence.interrupts == (OutputInterrupt(105), OutputInterrupt(106))
+    assert divergence.instructions[0] - divergence.start == 3
+    assert divergence.instruction == divergence.instructions[0]
+
+    class Misread(CompiledMachine):
+        # Reads 14 as 15.
+        def _feed(self, value):
+            super()._feed(15 if value == 14 else value)
+
+    divergence = find_divergence(replay, Machine, Misread)
+    assert divergence.interrupts == (OutputInterrupt(105), OutputInterrupt(106))
+    # The input instruction itself is the first to leave different state.
+    assert divergence.instruction == divergence.start + 1
+
+
+def test_find_divergence_bisects():
+    from intcode.machine import _COUNTDOWN, LimitReached
+
+    class Corrupt(Machine):
+        # Sets the unused [19] once past 50 instructions, mid-loop.
+        def _execute(self, limit=None):
+            if self.instructions < 50 and (limit is None or limit > 50):
+                interrupt = super()._execute(50)
+                if not isinstance(interrupt, LimitReached):
+                    return interrupt
+                self.memory[19] = 1
+            return super()._execute(limit)
+
+    mac = Machine(_COUNTDOWN)
+    mac.recorder = Recorder(mac)
+    list(mac.communicate([]))
+    divergence = find_divergence(mac.recorder.replay(), Machine, Corrupt)
+    # Only memory differs, which is first compared at the halt; the write
+    # lands with the 51st instruction.
+    assert divergence.addrs == [19]
+    assert (divergence.start, divergence.instruction) == (0, 51)
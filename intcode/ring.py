@@ -0,0 +1,106 @@
+from typing import Iterable, List, Optional, Union
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of ints backed by a preallocated list.
+
+    write() and read() move whole runs with slice assignments; str values
+    are written as their code points, converted in bulk through latin-1
+    where possible.
+    """
+    capacity: int
+    _data: List[int]
+    _start: int
+    _size: int
+
+    def __init__(self, capacity: int = 4096):
+        if capacity <= 0:
+            raise Exception('Capacity must be positive')
+        self.capacity = capacity
+        self._data = [0] * capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def full(self) -> bool:
+        return self._size == self.capacity
+
+    def push(self, value: int) -> None:
+        if self._size == self.capacity:
+            raise Exception('Buffer full')
+        self._data[(self._start + self._size) % self.capacity] = value
+        self._size += 1
+
+    def peek(self) -> int:
+        if not self._size:
+            raise Exception('Buffer empty')
+        return self._data[self._start]
+
+    def pop(self) -> int:
+        value = self.peek()
+        self._start = (self._start + 1) % self.capacity
+        self._size -= 1
+        return value
+
+    def write(self, values: Union[str, bytes, Iterable[int]]) -> int:
+        """Appends as many values as fit and returns how many were written."""
+        if isinstance(values, str):
+            try:
+                values = values.encode('latin-1')
+            except UnicodeEncodeError:
+                values = [ord(c) for c in values]
+        elif not isinstance(values, (bytes, bytearray, list)):
+            values = list(values)
+        n = min(len(values), self.capacity - self._size)
+        end = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - end)
+        self._data[end:end + first] = values[:first]
+        self._data[:n - first] = values[first:n]
+        self._size += n
+        return n
+
+    def read(self, size: Optional[int] = None) -> List[int]:
+        """Removes and returns up to size values, all by default."""
+        n = self._size if size is None else min(size, self._size)
+        start = self._start
+        values = self._data[start:start + n]
+        if len(values) < n:
+            values.extend(self._data[:n - len(values)])
+        self._start = (start + n) % self.capacity
+        self._size -= n
+        return values
+
+    def read_str(self, size: Optional[int] = None) -> str:
+        values = self.read(size)
+        try:
+            return bytes(values).decode('latin-1')
+        except ValueError:
+            return ''.join(map(chr, values))
+
+    def read_bytes(self, size: Optional[int] = None) -> bytes:
+        return bytes(self.read(size))
+
+
+def test_ring_buffer():
+    buf = RingBuffer(4)
+    assert buf.write('abc') == 3
+    assert buf.pop() == ord('a')
+    assert buf.write(b'def') == 2
+    assert buf.full()
+    assert buf.read_str() == 'bcde'
+    assert not buf
+    buf.push(1)
+    buf.push(2)
+    assert buf.write(range(3, 10)) == 2
+    assert buf.read(3) == [1, 2, 3]
+    assert buf.read_bytes() == b'\x04'
+    buf.write('\u263a!')
+    assert buf.read_str() == '\u263a!'
+    try:
+        buf.pop()
+    except Exception:
+        pass
+    else:
+        assert False, 'Empty pop succeeded'
@@ -0,0 +1,81 @@
+"""Parallel parameter sweeps over one Intcode program.
+
+The program is shipped once to each worker process when the pool starts;
+afterwards only parameter tuples and results cross process boundaries, in
+chunks. evaluate and setup must be picklable, i.e. module-level functions,
+classes or their methods.
+"""
+
+import multiprocessing
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+from intcode.machine import Machine
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Worker state: the result of setup, or the program without one.
+_state: Any = None
+_evaluate: Optional[Callable] = None
+
+
+def _init(code: List[int], evaluate: Callable, setup: Optional[Callable]) -> None:
+    global _state, _evaluate
+    _state = setup(code) if setup is not None else code
+    _evaluate = evaluate
+
+
+def _call(param):
+    return _evaluate(_state, param)
+
+
+def sweep(
+        evaluate: Callable[[Any, T], R],
+        code: List[int],
+        params: Iterable[T],
+        processes: Optional[int] = None,
+        chunksize: int = 16,
+        setup: Optional[Callable[[List[int]], Any]] = None) -> Iterator[R]:
+    """Yields evaluate(code, param) for every param, in order.
+
+    With setup, each worker calls setup(code) once when the pool starts and
+    evaluates evaluate(state, param) on its result instead, so state that
+    is expensive to build, such as booted machines, is reused across the
+    params the worker is sent.
+
+    Results are streamed as soon as they are ready in order; breaking out of
+    the loop stops the pool.
+    """
+    with multiprocessing.Pool(processes, initializer=_init, initargs=(code, evaluate, setup)) as pool:
+        yield from pool.imap(_call, params, chunksize)
+
+
+def outputs(code: List[int], inputs: Sequence[int]) -> List[int]:
+    """Evaluation returning all outputs of a run with the given inputs."""
+    return list(Machine(code).communicate(inputs))
+
+
+def test_sweep():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    params = [(i,) for i in range(20)]
+    results = list(sweep(outputs, code, params, processes=2, chunksize=3))
+    assert results == [[1 if i == 8 else 0] for i in range(20)]
+
+
+def test_sweep_break():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    for i, result in enumerate(sweep(outputs, code, ((i,) for i in range(1000)), processes=2)):
+        if result == [1]:
+            break
+    assert i == 8
+
+
+def test_sweep_setup():
+    code = [int(s) for s in '3,9,8,9,10,9,4,9,99,-1,8'.split(',')]
+    # Every worker boots one machine and forks it per param.
+    results = list(sweep(_fork_outputs, code, [(i,) for i in range(20)], processes=2, chunksize=3, setup=Machine))
+    assert results == [[1 if i == 8 else 0] for i in range(20)]
+
+
+def _fork_outputs(mac: Machine, inputs: Sequence[int]) -> List[int]:
+    return list(mac.fork().communicate(inputs))